@@ -0,0 +1,392 @@
+﻿import numpy as np
+import pandas as pd
+import argparse
+import sys
+import time
+
+# Параметры HashTable (include/HashTable.h, src/HashTable.cpp)
+INITIAL_CAPACITY = 16
+LOAD_FACTOR_THRESHOLD = 0.5
+
+# Значения ProbingMethod совпадают с колонкой method в CSV
+METHOD_CODES = {
+    'double_hashing': 0,
+    'linear': 1,
+    'quadratic': 2
+}
+
+SCENARIOS = ['random', 'ascending', 'clustered', 'high_collision']
+
+# Операции бенчмарка, для которых модель даёт число проб (все бенчмарки, кроме вставки, используют random)
+MODEL_OPERATIONS = ['insert', 'upsert', 'find', 'find_existing', 'find_missing', 'erase']
+
+# Свободная ячейка в массиве владельцев: больше любого приоритета ключа
+EMPTY_SLOT = np.iinfo(np.int64).max
+
+# Ограничение размера блока попыток за раунд (ключей * попыток) и число попыток на ключ
+PROBE_BLOCK_ELEMENTS = 1 << 16
+MAX_PROBE_BLOCK = 64
+
+
+def _uniform_ints(n, low, high, seed=42):
+    """std::uniform_int_distribution<int>(low, high) над std::mt19937(seed) в реализации libstdc++.
+
+    libstdc++ (GCC >= 11) использует метод Лемира: x = raw * span, результат - старшие 32 бита,
+    значения с младшими битами ниже (2^32 - span) % span отбрасываются. Сырые выходы mt19937
+    совпадают с RandomState(seed) (та же инициализация init_genrand).
+    """
+    span = high - low + 1
+    threshold = (2 ** 32 - span) % span
+    values = np.empty(0, dtype=np.int64)
+    rs = np.random.RandomState(seed)
+    while len(values) < n:
+        raw = rs.randint(0, 2 ** 32, size=n - len(values) + 64, dtype=np.uint32).astype(np.uint64)
+        product = raw * np.uint64(span)
+        accepted = (product & np.uint64(0xFFFFFFFF)) >= threshold
+        values = np.concatenate([values, (product[accepted] >> np.uint64(32)).astype(np.int64)])
+    return values[:n] + low
+
+
+def generate_keys(n, scenario, seed=42):
+    """Ключи сценария generate_data из Benchmark.cpp.
+
+    clustered и high_collision совпадают с данными бенчмарка, собранного с libstdc++;
+    для random совпадает только распределение (перестановка 0..n-1): порядок std::shuffle
+    зависит от реализации стандартной библиотеки, а от порядка зависит число коллизий.
+    """
+    if scenario == 'random':
+        return np.random.default_rng(seed).permutation(n).astype(np.int64)
+    if scenario == 'ascending':
+        return np.arange(n, dtype=np.int64)
+    if scenario == 'clustered':
+        return _uniform_ints(n, 0, 99, seed) * 10
+    if scenario == 'high_collision':
+        return _uniform_ints(n, 0, 9, seed)
+    raise ValueError(f"Неизвестный сценарий: {scenario}")
+
+
+def _as_size_t(keys):
+    """static_cast<size_t>(int): отрицательные ключи переходят в 2^64 + key"""
+    return np.asarray(keys, dtype=np.int64).astype(np.uint64)
+
+
+def probe_slots(keys, attempts, capacity, method):
+    """probe(key, attempt) для массивов ключей (size_t) и номеров попыток"""
+    capacity = np.uint64(capacity)
+    attempts = np.asarray(attempts, dtype=np.uint64)
+    h1 = keys % capacity
+    if method == METHOD_CODES['linear']:
+        return (h1 + attempts) % capacity
+    if method == METHOD_CODES['quadratic']:
+        return (h1 + attempts * attempts) % capacity
+    h2 = np.uint64(1) + keys % (capacity - np.uint64(1))
+    return (h1 + attempts * h2) % capacity
+
+
+def probe_period(keys, capacity, method):
+    """Период последовательности probe(key, attempt) по attempt: дальше ячейки повторяются.
+
+    Линейное пробирование обходит все capacity ячеек, квадратичное при capacity, кратной 4,
+    повторяется через capacity / 2 попыток, двойное хэширование - через capacity / gcd(hash2, capacity).
+    """
+    if method == METHOD_CODES['linear']:
+        return np.full(len(keys), capacity, dtype=np.int64)
+    if method == METHOD_CODES['quadratic']:
+        return np.full(len(keys), capacity // 2 if capacity % 4 == 0 else capacity, dtype=np.int64)
+    h2 = np.uint64(1) + keys % np.uint64(capacity - 1)
+    if capacity & (capacity - 1) == 0:
+        # Ёмкость - степень двойки: gcd(hash2, capacity) - младший установленный бит hash2
+        divisor = np.minimum(h2 & (~h2 + np.uint64(1)), np.uint64(capacity))
+    else:
+        divisor = np.gcd(h2, np.uint64(capacity))
+    return (np.uint64(capacity) // divisor).astype(np.int64)
+
+
+def _probe_block(active_count):
+    """Сколько попыток подряд проверяет каждый активный ключ за раунд"""
+    return int(min(MAX_PROBE_BLOCK, max(1, PROBE_BLOCK_ELEMENTS // max(active_count, 1))))
+
+
+def place_keys(keys, capacity, method, owner, first_priority=0):
+    """Последовательная вставка различных ключей в таблицу owner, раундами по всем ключам сразу.
+
+    owner[slot] - приоритет (порядковый номер вставки) ключа в ячейке или EMPTY_SLOT.
+    Ключ i получает приоритет first_priority + i. В каждом раунде все неразмещённые ключи
+    претендуют на первую ячейку своей последовательности, не занятую более ранним ключом;
+    ячейка достаётся наименьшему приоритету, проигравшие и вытесненные прежние владельцы
+    переходят к следующей попытке. Владелец ячейки меняется только на более ранний ключ,
+    поэтому пропущенные ячейки в итоге заняты более ранними ключами, и неподвижная точка
+    совпадает с последовательной вставкой.
+
+    Возвращает номера итоговых попыток; capacity - ключ не поместился (все capacity попыток заняты).
+    owner изменяется на месте.
+    """
+    count = len(keys)
+    attempts = np.zeros(count, dtype=np.int64)
+    periods = probe_period(keys, capacity, method)
+    active = np.arange(count, dtype=np.int64)
+
+    while len(active):
+        priorities = active + first_priority
+        block = _probe_block(len(active))
+        tries = attempts[active][:, None] + np.arange(block, dtype=np.int64)
+        slots = probe_slots(keys[active][:, None], tries, capacity, method).astype(np.int64)
+
+        # Ячейки более ранних ключей пропускаются сразу: их владелец уже не станет более поздним
+        open_slots = (owner[slots] > priorities[:, None]) & (tries < periods[active][:, None])
+        found = open_slots.any(axis=1)
+        step = np.where(found, open_slots.argmax(axis=1), block)
+        attempts[active] += step
+        waiting = active[~found]
+
+        claim = active[found]
+        claim_slots = slots[found, step[found]]
+        claim_priorities = priorities[found]
+        previous = owner[claim_slots]
+        np.minimum.at(owner, claim_slots, claim_priorities)
+        current = owner[claim_slots]
+
+        lost = claim[current != claim_priorities]
+        displaced = np.unique(previous[(previous != EMPTY_SLOT) & (previous != current)])
+        displaced = displaced[displaced >= first_priority] - first_priority
+        moved = np.concatenate([lost, displaced])
+        attempts[moved] += 1
+
+        # Ключ, прошедший весь период без свободной ячейки, не помещается (как и в C++ после capacity попыток)
+        active = np.concatenate([waiting, moved])
+        exhausted = attempts[active] >= periods[active]
+        attempts[active[exhausted]] = capacity
+        active = active[~exhausted]
+
+    return attempts
+
+
+def _rehash(owner, priority_keys, capacity, method):
+    """rehash(): живые ключи в порядке старых ячеек вставляются в таблицу вдвое большей ёмкости"""
+    slots = np.nonzero(owner != EMPTY_SLOT)[0]
+    keys = priority_keys[owner[slots]]
+
+    new_owner = np.full(capacity, EMPTY_SLOT, dtype=np.int64)
+    attempts = place_keys(keys, capacity, method, new_owner)
+    return keys, attempts, new_owner
+
+
+def simulate_insertions(keys, method):
+    """Последовательность вызовов HashTable::insert (или upsert) с ключами keys в пустую таблицу.
+
+    Возвращает словарь:
+      probes      - число проверенных ячеек для каждого вызова,
+      collisions  - прирост collision_count() для каждого вызова (max(попытка - 1, 0)),
+      inserted    - вызов добавил новый ключ,
+      find_probes - число проб успешного поиска каждого ключа итоговой таблицы,
+      table_keys  - ключи итоговой таблицы, occupied - маска занятых ячеек,
+      capacity, size, rehashes.
+    """
+    keys = _as_size_t(keys)
+    total = len(keys)
+    probes = np.zeros(total, dtype=np.int64)
+    collisions = np.zeros(total, dtype=np.int64)
+    inserted = np.zeros(total, dtype=bool)
+
+    capacity = INITIAL_CAPACITY
+    owner = np.full(capacity, EMPTY_SLOT, dtype=np.int64)
+    resident_keys = np.empty(0, dtype=np.uint64)
+    resident_attempts = np.empty(0, dtype=np.int64)
+    rehashes = 0
+    position = 0
+
+    while True:
+        # Ключи после rehash с приоритетами 0..R-1; ключ, не поместившийся при rehash, потерян
+        live = resident_attempts < capacity
+        size = int(live.sum())
+        room = int(np.floor(LOAD_FACTOR_THRESHOLD * capacity)) - size
+        live_keys = resident_keys[live]
+        live_attempts = resident_attempts[live]
+
+        window = min(total - position, room)
+        while True:
+            calls = keys[position:position + window]
+
+            # Одна сортировка на резидентов и вызовы: вызов - повтор резидента, если первое вхождение ключа < R
+            unique_keys, first, inverse = np.unique(np.concatenate([live_keys, calls]),
+                                                    return_index=True, return_inverse=True)
+            call_unique = inverse[len(live_keys):]
+            is_first = np.zeros(len(calls), dtype=bool)
+            is_first[first[first >= len(live_keys)] - len(live_keys)] = True
+
+            # Первые вхождения новых ключей в порядке вызовов получают приоритеты R, R+1, ...
+            first_positions = np.nonzero(is_first)[0]
+            first_keys = calls[first_positions]
+            if len(first_keys) < room and position + window < total:
+                # Повторы ключей: в окне меньше room новых ключей - расширяем окно
+                window = min(total - position, 2 * window)
+                continue
+
+            # Вставляем ровно недостающее до room число ключей (порядок вставки сохраняет префикс),
+            # чтобы таблица не заполнялась сверх порога и кластеры не росли
+            trial_owner = owner.copy()
+            new_attempts = np.empty(0, dtype=np.int64)
+            successes = 0
+            while successes < room and len(new_attempts) < len(first_keys):
+                batch = first_keys[len(new_attempts):len(new_attempts) + room - successes]
+                attempts = place_keys(batch, capacity, method, trial_owner,
+                                      first_priority=len(resident_keys) + len(new_attempts))
+                new_attempts = np.concatenate([new_attempts, attempts])
+                successes += int((attempts < capacity).sum())
+
+            if successes >= room or position + window >= total:
+                break
+            # Неудачные вставки: новых ключей в окне не хватило - расширяем окно
+            window = min(total - position, 2 * window)
+
+        included = len(new_attempts)
+        end = int(first_positions[included - 1]) + 1 if successes >= room else len(calls)
+
+        # Попытка каждого вызова: попытка резидента или первого вхождения ключа (capacity при неудаче)
+        unique_attempts = np.empty(len(unique_keys), dtype=np.int64)
+        resident_unique = first < len(live_keys)
+        unique_attempts[resident_unique] = live_attempts[first[resident_unique]]
+        unique_attempts[call_unique[first_positions[:included]]] = new_attempts
+        call_attempts = unique_attempts[call_unique[:end]]
+
+        failed = call_attempts >= capacity
+        probes[position:position + end] = np.where(failed, capacity, call_attempts + 1)
+        collisions[position:position + end] = np.maximum(np.minimum(call_attempts, capacity) - 1, 0)
+        new_inserted = first_positions[:included][new_attempts[:included] < capacity]
+        inserted[position + new_inserted] = True
+        position += end
+
+        owner = trial_owner
+        priority_keys = np.concatenate([resident_keys, first_keys[:included]])
+        priority_attempts = np.concatenate([resident_attempts, new_attempts[:included]])
+        if position >= total:
+            break
+
+        # Следующий вызов застаёт size == capacity * LOAD_FACTOR_THRESHOLD и вызывает rehash()
+        capacity *= 2
+        rehashes += 1
+        resident_keys, resident_attempts, owner = _rehash(owner, priority_keys, capacity, method)
+
+    occupied = owner != EMPTY_SLOT
+    table_priorities = owner[occupied]
+    return {
+        'probes': probes,
+        'collisions': collisions,
+        'inserted': inserted,
+        'find_probes': priority_attempts[table_priorities] + 1,
+        'table_keys': priority_keys[table_priorities],
+        'occupied': occupied,
+        'capacity': capacity,
+        'size': int(occupied.sum()),
+        'rehashes': rehashes
+    }
+
+
+def unsuccessful_find_probes(keys, occupied, method):
+    """Число проб поиска отсутствующих ключей: до первой свободной ячейки (без удалений)"""
+    keys = _as_size_t(keys)
+    capacity = len(occupied)
+    probes = np.full(len(keys), capacity, dtype=np.int64)
+    attempts = np.zeros(len(keys), dtype=np.int64)
+    periods = probe_period(keys, capacity, method)
+    active = np.arange(len(keys))
+
+    while len(active):
+        block = _probe_block(len(active))
+        tries = attempts[active][:, None] + np.arange(block, dtype=np.int64)
+        slots = probe_slots(keys[active][:, None], tries, capacity, method).astype(np.int64)
+        free = ~occupied[slots] & (tries < periods[active][:, None])
+
+        found = free.any(axis=1)
+        probes[active[found]] = attempts[active[found]] + free[found].argmax(axis=1) + 1
+        attempts[active] += block
+        active = active[~found]
+        active = active[attempts[active] < periods[active]]
+
+    return probes
+
+
+def probe_distribution(probes):
+    """Распределение числа проб: доля вызовов с 1, 2, ... пробами"""
+    counts = np.bincount(probes)
+    return pd.Series(counts / max(len(probes), 1), name='share').rename_axis('probes').iloc[1:]
+
+
+def _probe_row(operation, scenario, n, method, probes, result):
+    """Строка таблицы предсказаний"""
+    return {
+        'operation': operation,
+        'scenario': scenario,
+        'n': n,
+        'method': method,
+        'predicted_probes_mean': probes.mean() if len(probes) else np.nan,
+        'predicted_probes_p50': np.percentile(probes, 50) if len(probes) else np.nan,
+        'predicted_probes_p99': np.percentile(probes, 99) if len(probes) else np.nan,
+        'predicted_probes_max': probes.max() if len(probes) else np.nan,
+        'predicted_collisions': result['collisions'].sum() if operation in ('insert', 'upsert') else np.nan,
+        'predicted_load_factor': result['size'] / result['capacity'],
+        'predicted_unique_keys': result['size']
+    }
+
+
+def predict_config(scenario, n, method):
+    """Предсказания для всех операций бенчмарка с данными scenario размера n"""
+    keys = generate_keys(n, scenario)
+    result = simulate_insertions(keys, method)
+
+    rows = [_probe_row('insert', scenario, n, method, result['probes'], result),
+            _probe_row('upsert', scenario, n, method, result['probes'], result)]
+    if scenario == 'random':
+        # find/find_existing/erase ищут все вставленные ключи, find_missing - ключи n..2n-1
+        for operation in ['find', 'find_existing', 'erase']:
+            rows.append(_probe_row(operation, scenario, n, method, result['find_probes'], result))
+        missing = unsuccessful_find_probes(np.arange(n, 2 * n), result['occupied'], method)
+        rows.append(_probe_row('find_missing', scenario, n, method, missing, result))
+    return rows
+
+
+def predict_probes(configs):
+    """Таблица предсказаний для конфигураций (scenario, n, method)"""
+    rows = []
+    for scenario, n, method in sorted(set(configs)):
+        rows.extend(predict_config(scenario, int(n), int(method)))
+    return pd.DataFrame(rows)
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="Модель пробирования HashTable без запуска бенчмарка")
+    parser.add_argument('-n', type=int, nargs='+', default=[1024], help="Число вставляемых ключей")
+    parser.add_argument('--scenario', choices=SCENARIOS, nargs='+', default=['random'])
+    parser.add_argument('--method', choices=list(METHOD_CODES), nargs='+', default=list(METHOD_CODES))
+    parser.add_argument('--distribution', action='store_true',
+                        help="Вывести распределение числа проб вставки")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Таблица предсказаний (и распределения) для заданных конфигураций"""
+    args = parse_args(argv)
+    for scenario in args.scenario:
+        for n in args.n:
+            for method_name in args.method:
+                method = METHOD_CODES[method_name]
+                start = time.perf_counter()
+                result = simulate_insertions(generate_keys(n, scenario), method)
+                elapsed = time.perf_counter() - start
+
+                print(f"\n {scenario}, N={n}, {method_name}: {elapsed:.2f} с")
+                print(f"   Ёмкость: {result['capacity']}, ключей: {result['size']}, "
+                      f"rehash: {result['rehashes']}, коллизий: {int(result['collisions'].sum())}")
+                print(f"   Проб на вставку: среднее {result['probes'].mean():.3f}, "
+                      f"P99 {np.percentile(result['probes'], 99):.0f}, max {result['probes'].max()}")
+                print(f"   Проб на успешный поиск: среднее {result['find_probes'].mean():.3f}")
+                if args.distribution:
+                    distribution = probe_distribution(result['probes'])
+                    for probes, share in distribution[distribution > 0].items():
+                        print(f"     {probes:>5}: {share:.6f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
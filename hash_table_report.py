@@ -1,15 +1,44 @@
 ﻿import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
-from matplotlib.backends.backend_pdf import PdfPages
+from pandas.api.types import union_categoricals
 import numpy as np
+import argparse
+import functools
+import hashlib
+import io
+import json
 import os
-
-# Настройка стиля графиков
-sns.set(style="whitegrid")
-plt.rcParams["figure.figsize"] = (12, 8)
-plt.rcParams["font.size"] = 12
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+# matplotlib/seaborn импортируются только при построении графиков (см. _import_plotting)
+matplotlib = None
+plt = None
+PdfPages = None
+
+
+def _import_plotting():
+    """Отложенный импорт и настройка графических библиотек"""
+    global matplotlib, plt, PdfPages
+    if plt is not None:
+        return
+
+    import matplotlib
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    # Настройка стиля графиков
+    sns.set(style="whitegrid")
+    plt.rcParams["figure.figsize"] = (12, 8)
+    plt.rcParams["font.size"] = 12
 
 # Цвета для разных методов пробирования
 METHOD_COLORS = {
@@ -26,6 +55,14 @@ METHOD_NAMES = {
     -1: 'STL unordered_map'
 }
 
+# Имена методов в командной строке
+METHOD_CODES = {
+    'double_hashing': 0,
+    'linear': 1,
+    'quadratic': 2,
+    'stl': -1
+}
+
 SCENARIO_NAMES = {
     'random': 'Случайные ключи',
     'ascending': 'Возрастающая последовательность',
@@ -44,489 +81,3083 @@ OPERATION_NAMES = {
     'stl_find': 'STL Поиск'
 }
 
+# Что означает одно измерение в файлах задержек (см. src/Benchmark.cpp):
+# 'total' - время всех N операций итерации, 'per_op' - время, уже усреднённое на одну операцию.
+# Неизвестные операции считаются 'per_op'
+OPERATION_SEMANTICS = {
+    'insert': 'total',
+    'upsert': 'total',
+    'stl_insert': 'total',
+    'find': 'per_op',
+    'find_existing': 'per_op',
+    'find_missing': 'per_op',
+    'erase': 'per_op',
+    'stl_find': 'per_op'
+}
 
-def load_and_prepare_data(csv_directory):
-    """Загрузка и подготовка данных из CSV файлов"""
-    data_dir = Path(csv_directory)
-    print(f" Ищем CSV файлы в: {data_dir.absolute()}")
+# Колоночный кэш разобранных CSV файлов
+CACHE_DIR_NAME = ".report_cache"
+CACHE_FORMAT_VERSION = 2
+
+# Компактные типы колонок, задаваемые при чтении CSV
+CSV_DTYPES = {
+    'operation': 'category',
+    'scenario': 'category',
+    'n': np.int32,
+    'method': np.int8,
+    'latency_ns': np.int64
+}
 
-    csv_files = list(data_dir.glob("*.csv"))
+# Бинарный формат задержек (.lat), записываемый бенчмарком с --latency_format=bin:
+# последовательность записей "заголовок 64 байта + count значений int64 (little-endian)"
+LATENCY_BIN_SUFFIX = '.lat'
+LATENCY_BIN_MAGIC = b'HTLB'
+LATENCY_BIN_HEADER = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u4'),
+    ('operation', 'S16'),
+    ('scenario', 'S16'),
+    ('n', '<i4'),
+    ('method', '<i4'),
+    ('count', '<u8'),
+    ('reserved', '<u8')
+])
+
+# Ключ группы измерений: одна конфигурация бенчмарка
+GROUP_KEYS = ['operation', 'scenario', 'n', 'method']
+
+# Фильтрация выбросов: порог по умолчанию для каждого метода
+# mad - медиана ± k·1.4826·MAD, iqr - [Q1 - k·IQR, Q3 + k·IQR], percentile - не выше k-го перцентиля
+OUTLIER_THRESHOLDS = {
+    'mad': 5.0,
+    'iqr': 3.0,
+    'percentile': 99.5
+}
 
-    if not csv_files:
-        available_files = list(data_dir.glob("*"))
-        print(f" Доступные файлы в директории:")
-        for f in available_files:
-            print(f"   - {f.name}")
-        raise FileNotFoundError(f"CSV файлы не найдены в директории {data_dir}")
 
-    print(f" Найдено CSV файлов: {len(csv_files)}")
+class StageProfiler:
+    """Профиль этапов отчёта: wall и CPU время, пик памяти (tracemalloc) каждого этапа; выключен по умолчанию"""
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = []
+        self._open = []
+        self._start = None
+
+    def start(self):
+        """Включение профилирования и трассировки выделений памяти"""
+        self.enabled = True
+        self.stages = []
+        self._open = []
+        tracemalloc.start()
+        self._start = (time.perf_counter(), time.process_time())
+
+    def _update_peaks(self):
+        """Пик памяти с прошлого сброса засчитывается всем открытым этапам"""
+        current, peak = tracemalloc.get_traced_memory()
+        for record in self._open:
+            record['peak_bytes'] = max(record['peak_bytes'], peak)
+        return current
+
+    @contextmanager
+    def stage(self, name, **details):
+        """Замер этапа; вложенные этапы учитываются и в пике внешних. Возвращает словарь деталей этапа"""
+        if not self.enabled:
+            yield details
+            return
 
-    all_data = []
-    for file in csv_files:
+        current = self._update_peaks()
+        tracemalloc.reset_peak()
+        record = {'name': name, 'depth': len(self._open), 'wall_s': None, 'cpu_s': None,
+                  'peak_bytes': current, 'start_bytes': current, 'allocated_bytes': None, 'details': details}
+        self.stages.append(record)
+        self._open.append(record)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
         try:
-            df = pd.read_csv(file)
-            print(f" Загружен: {file.name} ({len(df)} записей)")
+            yield details
+        finally:
+            record['wall_s'] = time.perf_counter() - wall_start
+            record['cpu_s'] = time.process_time() - cpu_start
+            record['allocated_bytes'] = self._update_peaks() - record['start_bytes']
+            self._open.pop()
+
+    def report(self, **meta):
+        """Профиль в виде словаря для JSON"""
+        wall_start, cpu_start = self._start
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            **meta,
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'total': {'wall_s': time.perf_counter() - wall_start, 'cpu_s': time.process_time() - cpu_start,
+                      'peak_bytes': max([peak] + [stage['peak_bytes'] for stage in self.stages])},
+            'stages': self.stages
+        }
+
+    def write(self, output_path, **meta):
+        """Сохранение профиля в JSON и краткая сводка по этапам"""
+        report = self.report(**meta)
+        self.enabled = False
+        tracemalloc.stop()
+
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+
+        print(f"\n ПРОФИЛЬ ЭТАПОВ (всего {report['total']['wall_s']:.2f} с, "
+              f"пик памяти {report['total']['peak_bytes'] / 2 ** 20:.1f} МБ):")
+        print(f"   {'этап':<32}{'раз':>5}{'wall, с':>10}{'cpu, с':>10}{'пик, МБ':>10}")
+        summary = {}
+        for stage in report['stages']:
+            key = ('  ' * stage['depth']) + stage['name']
+            calls, wall, cpu, peak = summary.get(key, (0, 0.0, 0.0, 0))
+            summary[key] = (calls + 1, wall + (stage['wall_s'] or 0.0), cpu + (stage['cpu_s'] or 0.0),
+                            max(peak, stage['peak_bytes']))
+        for key, (calls, wall, cpu, peak) in summary.items():
+            print(f"   {key:<32}{calls:>5}{wall:>10.3f}{cpu:>10.3f}{peak / 2 ** 20:>10.1f}")
+        print(f" Профиль сохранён: {Path(output_path).absolute()}")
+
+
+# Профилировщик конвейера (включается опцией --profile)
+PROFILER = StageProfiler()
+
+
+def profiled(name):
+    """Декоратор: вызов функции - отдельный этап профиля"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with PROFILER.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _file_fingerprint(file):
+    """Отпечаток файла: путь, размер и время модификации"""
+    stat = file.stat()
+    return {
+        'path': str(file.resolve()),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'version': CACHE_FORMAT_VERSION
+    }
 
-            # Автоматическое определение единиц измерения
-            if 'latency_ns' in df.columns:
-                sample_values = df['latency_ns'].head(3).tolist()
-                print(f"   Примеры latency_ns: {sample_values}")
 
-                median_val = df['latency_ns'].median()
-                print(f"   Медиана latency_ns: {median_val}")
+def _cache_entry_dir(cache_dir, file):
+    """Директория записи кэша для файла (по хэшу пути)"""
+    path_hash = hashlib.sha1(str(file.resolve()).encode('utf-8')).hexdigest()
+    return cache_dir / path_hash
+
+
+def _encode_columns(df):
+    """Компактное представление кадра: массивы колонок + словари строк"""
+    arrays = {}
+    categories = {}
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories[column] = [str(c) for c in values.cat.categories]
+            arrays[column] = values.cat.codes.to_numpy()
+        elif not pd.api.types.is_numeric_dtype(values):
+            codes, uniques = pd.factorize(values.astype(str))
+            categories[column] = [str(u) for u in uniques]
+            arrays[column] = codes.astype(np.int32)
+        else:
+            arrays[column] = values.to_numpy()
+    return arrays, categories
 
-                # Явная конвертация в микросекунды
-                df['latency_us'] = df['latency_ns'] / 1000.0
-                print(f"    Данные конвертированы из наносекунд в микросекунды")
 
-            else:
-                print(f"    Нет колонки latency_ns в файле")
-                continue
+def _decode_columns(arrays, categories):
+    """Восстановление DataFrame из компактного представления"""
+    columns = {}
+    for column, values in arrays.items():
+        if column in categories:
+            # Строковые колонки хранятся как коды + словарь значений
+            values = pd.Categorical.from_codes(values, categories[column])
+        columns[column] = values
+    return pd.DataFrame(columns)
+
+
+def _load_cached_file(cache_dir, file):
+    """Загрузка колонок файла из кэша, None если запись устарела"""
+    entry_dir = _cache_entry_dir(cache_dir, file)
+    meta_path = entry_dir / "meta.json"
+    if not meta_path.exists():
+        return None
+
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('fingerprint') != _file_fingerprint(file):
+            return None
+
+        arrays = {column: np.load(entry_dir / f"{column}.npy") for column in meta['columns']}
+        return _decode_columns(arrays, meta['categories'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_cached_file(cache_dir, file, df):
+    """Сохранение колонок разобранного файла в кэш"""
+    entry_dir = _cache_entry_dir(cache_dir, file)
+    tmp_dir = entry_dir.with_name(entry_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    arrays, categories = _encode_columns(df)
+    for column, values in arrays.items():
+        np.save(tmp_dir / f"{column}.npy", values)
+
+    meta = {
+        'fingerprint': _file_fingerprint(file),
+        'columns': list(arrays),
+        'categories': categories
+    }
+    with open(tmp_dir / "meta.json", 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    os.replace(tmp_dir, entry_dir)
+
+
+def _drop_incomplete_rows(df, dtypes):
+    """Отбрасывание строк с пропуском или нечисловым значением в ключе группы или задержке,
+    затем приведение к компактным типам"""
+    keep = df.notna().all(axis=1).to_numpy().copy()
+    numeric = {}
+    for column, dtype in dtypes.items():
+        if dtype != 'category':
+            numeric[column] = pd.to_numeric(df[column], errors='coerce')
+            keep &= numeric[column].notna().to_numpy()
+
+    df = df[keep].reset_index(drop=True)
+    for column, values in numeric.items():
+        df[column] = values[keep].to_numpy().astype(dtypes[column])
+    return df
+
+
+def _read_csv_tolerant(source, dtypes, **kwargs):
+    """read_csv с компактными типами; при повреждённых строках (например, обрезанная последняя
+    строка дописываемого файла) файл перечитывается как текст и такие строки отбрасываются"""
+    try:
+        df = pd.read_csv(source, dtype=dtypes, **kwargs)
+        # Пустые категориальные ключи не мешают разбору, но группу не образуют
+        categories = [column for column, dtype in dtypes.items() if dtype == 'category']
+        if df[categories].isna().any(axis=None):
+            df = _drop_incomplete_rows(df, dtypes)
+        return df
+    except (ValueError, TypeError):
+        pass
+
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    text_dtypes = {column: dtype if dtype == 'category' else str for column, dtype in dtypes.items()}
+    return _drop_incomplete_rows(pd.read_csv(source, dtype=text_dtypes, **kwargs), dtypes)
+
+
+def _read_latency_csv(file):
+    """Разбор одного CSV файла с задержками, None если нет latency_ns"""
+    header = pd.read_csv(file, nrows=0).columns
+    if 'latency_ns' not in header:
+        print(f" Загружен: {file.name}")
+        print(f"    Нет колонки latency_ns в файле")
+        return None
+
+    dtypes = {column: dtype for column, dtype in CSV_DTYPES.items() if column in header}
+    df = _read_csv_tolerant(file, dtypes, usecols=list(dtypes))
+    print(f" Загружен: {file.name} ({len(df)} записей)")
+
+    sample_values = df['latency_ns'].head(3).tolist()
+    print(f"   Примеры latency_ns: {sample_values}")
+
+    median_val = df['latency_ns'].median()
+    print(f"   Медиана latency_ns: {median_val}")
+
+    return df
+
+
+def _iter_latency_buffer(data, name, partial=False):
+    """Записи бинарного формата в буфере: (смещение после записи, запись).
+
+    При partial=True обрезанная последняя запись (файл ещё дописывается) не считается ошибкой.
+    """
+    offset = 0
+    while offset < len(data):
+        if offset + LATENCY_BIN_HEADER.itemsize > len(data):
+            if partial:
+                return
+            raise ValueError(f"Обрезанный заголовок записи в {name} (смещение {offset})")
+        header = np.frombuffer(data, dtype=LATENCY_BIN_HEADER, count=1, offset=offset)[0]
+        if header['magic'] != LATENCY_BIN_MAGIC:
+            raise ValueError(f"Неверная сигнатура записи в {name} (смещение {offset})")
+
+        start = offset + LATENCY_BIN_HEADER.itemsize
+        count = int(header['count'])
+        if start + count * 8 > len(data):
+            if partial:
+                return
+            raise ValueError(f"Обрезанная запись в {name} (смещение {start})")
+        latencies = np.frombuffer(data, dtype='<i8', count=count, offset=start)
+        offset = start + count * 8
+
+        yield offset, (header['operation'].decode('ascii'), header['scenario'].decode('ascii'),
+                       int(header['n']), int(header['method']), latencies)
+
+
+def iter_latency_records(file):
+    """Записи бинарного файла задержек: (operation, scenario, n, method, массив задержек).
+
+    Массив задержек - представление np.memmap над файлом, без копирования.
+    """
+    if file.stat().st_size == 0:
+        return
+
+    data = np.memmap(file, dtype=np.uint8, mode='r')
+    for _, record in _iter_latency_buffer(data, file.name):
+        yield record
+
+
+def _read_latency_bin(file):
+    """Чтение бинарного файла задержек в компактный DataFrame"""
+    records = list(iter_latency_records(file))
+    print(f" Загружен: {file.name} ({sum(len(r[4]) for r in records)} записей, {len(records)} конфигураций)")
+
+    counts = np.array([len(r[4]) for r in records], dtype=np.int64)
+    columns = {}
+    for position, column in [(0, 'operation'), (1, 'scenario')]:
+        codes, categories = pd.factorize(np.array([r[position] for r in records], dtype=object))
+        columns[column] = pd.Categorical.from_codes(np.repeat(codes.astype(np.int8), counts),
+                                                    [str(c) for c in categories])
+    columns['n'] = np.repeat(np.array([r[2] for r in records], dtype=np.int32), counts)
+    columns['method'] = np.repeat(np.array([r[3] for r in records], dtype=np.int8), counts)
+
+    if len(records) == 1:
+        columns['latency_ns'] = records[0][4]
+    elif records:
+        columns['latency_ns'] = np.concatenate([r[4] for r in records])
+    else:
+        columns['latency_ns'] = np.empty(0, dtype=np.int64)
+
+    return pd.DataFrame(columns, copy=False)
+
+
+def data_directories(csv_directory):
+    """Директории с данными: одна или список (например, по директории на конфигурацию бенчмарка)"""
+    if isinstance(csv_directory, (list, tuple)):
+        return [Path(directory) for directory in csv_directory]
+    return [Path(csv_directory)]
+
+
+def latency_files(data_dir):
+    """Файлы задержек в директории (или списке директорий): CSV и бинарные .lat.
+    Если для одного имени есть оба формата, берётся более свежий файл"""
+    files = []
+    for directory in data_directories(data_dir):
+        found = sorted(directory.glob("*.csv")) + sorted(directory.glob(f"*{LATENCY_BIN_SUFFIX}"))
+        newest = {}
+        for file in found:
+            other = newest.get(file.stem)
+            if other is None or file.stat().st_mtime > other.stat().st_mtime:
+                newest[file.stem] = file
+        for file in found:
+            if newest[file.stem] != file:
+                print(f"    Пропущен {file.name}: есть более свежий {newest[file.stem].name}")
+        files += list(newest.values())
+    return files
+
+
+def _load_latency_file(file, cache_dir=None):
+    """Загрузка файла задержек с использованием кэша"""
+    if file.suffix == LATENCY_BIN_SUFFIX:
+        # Бинарный формат читается через memmap и в кэше не нуждается
+        return _read_latency_bin(file)
+
+    if cache_dir is not None:
+        df = _load_cached_file(cache_dir, file)
+        if df is not None:
+            print(f" Загружен из кэша: {file.name} ({len(df)} записей)")
+            return df
+
+    df = _read_latency_csv(file)
+    if df is None:
+        return None
+
+    if cache_dir is not None:
+        try:
+            _save_cached_file(cache_dir, file, df)
+        except OSError as e:
+            print(f"   Не удалось сохранить кэш для {file.name}: {e}")
+
+    return df
 
-            df['source_file'] = file.name
-            all_data.append(df)
 
-        except Exception as e:
-            print(f" Ошибка загрузки {file.name}: {e}")
+def _load_latency_file_compact(file, cache_dir=None):
+    """Загрузка файла в рабочем процессе: возвращает компактные массивы"""
+    try:
+        df = _load_latency_file(file, cache_dir)
+    except Exception as e:
+        print(f" Ошибка загрузки {file.name}: {e}")
+        return None
+
+    if df is None:
+        return None
+    return _encode_columns(df)
+
+
+def _load_latency_files(csv_files, cache_dirs=None, jobs=1):
+    """Загрузка списка файлов последовательно или пулом процессов (cache_dirs - кэш для каждого файла)"""
+    if jobs is None or jobs <= 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(csv_files))
+    if cache_dirs is None:
+        cache_dirs = [None] * len(csv_files)
+
+    if jobs <= 1:
+        frames = []
+        for file, cache_dir in zip(csv_files, cache_dirs):
+            with PROFILER.stage('load_file', file=str(file), size_bytes=file.stat().st_size) as details:
+                try:
+                    frames.append(_load_latency_file(file, cache_dir))
+                    details['records'] = len(frames[-1]) if frames[-1] is not None else 0
+                except Exception as e:
+                    print(f" Ошибка загрузки {file.name}: {e}")
+                    frames.append(None)
+        return frames
+
+    # Файлы разбираются в дочерних процессах: в профиле только общий этап
+    print(f" Параллельная загрузка: {jobs} процессов")
+    with PROFILER.stage('load_files_parallel', files=len(csv_files), jobs=jobs):
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_load_latency_file_compact, csv_files, cache_dirs))
+
+    return [_decode_columns(*result) if result is not None else None
+            for result in results]
+
+
+def _concat_compact(frames):
+    """Объединение кадров с сохранением категориальных колонок"""
+    frames = [df for df in frames if len(df) > 0] or frames[:1]
+    for column in frames[0].columns:
+        if isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+            union = union_categoricals([df[column] for df in frames]).categories
+            for df in frames:
+                df[column] = df[column].cat.set_categories(union)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _map_categorical(values, names, fallback):
+    """Отображение значений в читаемые названия без построчных строк"""
+    categorical = values.astype('category')
+    labels = [names.get(value, fallback(value)) for value in categorical.cat.categories]
+    unique_labels = list(dict.fromkeys(labels))
+    lookup = np.array([unique_labels.index(label) for label in labels] + [-1], dtype=np.int32)
+    # Код -1 (пропуск) указывает на последний элемент lookup и остаётся -1
+    return pd.Categorical.from_codes(lookup[categorical.cat.codes.to_numpy()], unique_labels)
+
+
+def n_label(df):
+    """Подпись размеров N, присутствующих в данных (для заголовков)"""
+    sizes = sorted(int(n) for n in pd.unique(df['n']))
+    if not sizes:
+        return "N=?"
+    if len(sizes) > 4:
+        return f"N={sizes[0]}…{sizes[-1]}"
+    return "N=" + ", ".join(map(str, sizes))
+
+
+def ops_per_measurement(operation, n):
+    """Число операций в одном измерении (векторно): N для 'total', 1 для 'per_op'"""
+    operation = pd.Series(operation)
+    if isinstance(operation.dtype, pd.CategoricalDtype):
+        # Семантика определяется по словарю категорий и разворачивается по кодам
+        total = np.array([OPERATION_SEMANTICS.get(str(c)) == 'total' for c in operation.cat.categories] + [False])
+        is_total = total[operation.cat.codes.to_numpy()]
+    else:
+        is_total = operation.map(OPERATION_SEMANTICS).eq('total').to_numpy()
+    return np.where(is_total, np.asarray(n, dtype=np.float64), 1.0)
+
+
+def ns_per_op(df):
+    """Время одной операции в наносекундах для каждого измерения"""
+    return df['latency_ns'].to_numpy(dtype=np.float64) / ops_per_measurement(df['operation'], df['n'])
+
+
+def _ops_per_sec(ns):
+    """Пропускная способность по времени операции (NaN для нулевого времени)"""
+    ns = np.asarray(ns, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        return np.where(ns > 0, 1e9 / ns, np.nan)
+
+
+def add_operation_metrics(df):
+    """Колонка ns_per_op для каждого измерения (float32: 4 байта на строку; ops_per_sec
+    считается только по группам в add_group_metrics)"""
+    df['ns_per_op'] = ns_per_op(df).astype(np.float32)
+    return df
+
+
+def add_group_metrics(stats):
+    """Статистики групп на одну операцию (*_ns_per_op) и ops_per_sec по медиане.
+
+    Делитель постоянен внутри группы (операция и N - ключи группы), поэтому квантили
+    пересчитываются делением без обращения к измерениям.
+    """
+    ops = ops_per_measurement(stats['operation'], stats['n'])
+    for column in ['mean_ns', 'std_ns', 'min_ns', 'median_ns', 'p95_ns', 'p99_ns', 'p999_ns', 'max_ns']:
+        if column in stats.columns:
+            stats[f'{column}_per_op'] = stats[column].to_numpy(dtype=np.float64) / ops
+    stats['ops_per_sec'] = _ops_per_sec(stats['median_ns_per_op'])
+    return stats
+
+
+def _print_operation_overview(df):
+    """Число записей и медиана времени одной операции по каждой операции за один проход"""
+    per_op = pd.Series(ns_per_op(df), index=df.index)
+    overview = per_op.groupby(df['operation'], observed=True, sort=False).agg(['count', 'median'])
+    for operation, row in overview.iterrows():
+        print(f"   {operation}: {int(row['count'])} записей, "
+              f"медиана: {row['median']:.1f} нс/оп")
+
+
+@profiled('filter_outliers')
+def filter_outliers(df, method='mad', threshold=None):
+    """Робастная фильтрация выбросов внутри каждой группы (operation, scenario, n, method).
+
+    Границы считаются одним групповым проходом и разворачиваются на строки по номеру группы.
+    Возвращает отфильтрованный кадр и таблицу с числом удалённых измерений по группам.
+    """
+    # Строка с пустым ключом не входит ни в одну группу (ngroup() = -1) и сдвигала бы границы
+    missing_key = df[GROUP_KEYS].isna().any(axis=1).to_numpy()
+    if missing_key.any():
+        print(f"    Пропущено записей с пустым ключом группы: {int(missing_key.sum())}")
+        df = df[~missing_key].reset_index(drop=True)
+
+    if method == 'none':
+        dropped = df.groupby(GROUP_KEYS, observed=True)['latency_ns'].count().rename('count').reset_index()
+        dropped['lower_ns'] = -np.inf
+        dropped['upper_ns'] = np.inf
+        dropped['dropped'] = 0
+        return df, dropped
+    if method not in OUTLIER_THRESHOLDS:
+        raise ValueError(f"Неизвестный метод фильтрации выбросов: {method}")
+    if threshold is None:
+        threshold = OUTLIER_THRESHOLDS[method]
+
+    grouped = df.groupby(GROUP_KEYS, observed=True, sort=True)['latency_ns']
+    codes = grouped.ngroup().to_numpy()
+    values = df['latency_ns'].to_numpy(dtype=np.float64)
+
+    if method == 'mad':
+        median = grouped.median().to_numpy()
+        deviation = pd.Series(np.abs(values - median[codes]))
+        scale = 1.4826 * deviation.groupby(codes).median().to_numpy()
+        lower, upper = median - threshold * scale, median + threshold * scale
+    elif method == 'iqr':
+        quartiles = grouped.quantile([0.25, 0.75]).unstack()
+        q1, q3 = quartiles[0.25].to_numpy(), quartiles[0.75].to_numpy()
+        scale = q3 - q1
+        lower, upper = q1 - threshold * scale, q3 + threshold * scale
+    else:
+        scale = np.ones(grouped.ngroups)
+        lower = np.full(grouped.ngroups, -np.inf)
+        upper = grouped.quantile(threshold / 100.0).to_numpy()
+
+    # Вырожденный разброс (все значения одинаковы) - группу не фильтруем
+    lower = np.where(scale > 0, lower, -np.inf)
+    upper = np.where(scale > 0, upper, np.inf)
+
+    keep = (values >= lower[codes]) & (values <= upper[codes])
+
+    dropped = grouped.count().rename('count').reset_index()
+    dropped['lower_ns'] = lower
+    dropped['upper_ns'] = upper
+    dropped['dropped'] = np.bincount(codes[~keep], minlength=len(dropped))
+
+    return df[keep].reset_index(drop=True), dropped
+
+
+@profiled('load_and_prepare_data')
+def load_and_prepare_data(csv_directory, use_cache=True, jobs=1,
+                          outlier_method='mad', outlier_threshold=None):
+    """Загрузка и подготовка данных из CSV (и бинарных .lat) файлов одной или нескольких директорий"""
+    data_dirs = data_directories(csv_directory)
+    for data_dir in data_dirs:
+        print(f" Ищем CSV файлы в: {data_dir.absolute()}")
+
+    csv_files = latency_files(data_dirs)
+
+    if not csv_files:
+        for data_dir in data_dirs:
+            available_files = list(data_dir.glob("*"))
+            print(f" Доступные файлы в директории {data_dir}:")
+            for f in available_files:
+                print(f"   - {f.name}")
+        raise FileNotFoundError(f"CSV файлы не найдены в директории {', '.join(map(str, data_dirs))}")
+
+    print(f" Найдено файлов задержек: {len(csv_files)}")
+
+    # Кэш хранится рядом с данными, в каждой директории свой
+    cache_dirs = [file.parent / CACHE_DIR_NAME for file in csv_files] if use_cache else None
+
+    all_data = []
+    for file, df in zip(csv_files, _load_latency_files(csv_files, cache_dirs, jobs)):
+        if df is None:
             continue
 
+        source = f"{file.parent.name}/{file.name}" if len(data_dirs) > 1 else file.name
+        df['source_file'] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), [source])
+        all_data.append(df)
+
     if not all_data:
         raise ValueError("Не удалось загрузить ни одного CSV файла")
 
-    combined_df = pd.concat(all_data, ignore_index=True)
-
-    # Очистка данных
-    combined_df = combined_df.dropna(subset=['latency_us'])
-    combined_df['latency_us'] = pd.to_numeric(combined_df['latency_us'], errors='coerce')
-    combined_df = combined_df.dropna(subset=['latency_us'])
-
-    # Добавляем читаемые названия
-    combined_df['method_name'] = combined_df['method'].map(METHOD_NAMES)
-    combined_df['scenario_name'] = combined_df['scenario'].map(SCENARIO_NAMES)
-    combined_df['operation_name'] = combined_df['operation'].map(OPERATION_NAMES)
+    with PROFILER.stage('concat', files=len(all_data)):
+        combined_df = _concat_compact(all_data)
 
-    combined_df['method_name'] = combined_df['method_name'].fillna('Unknown')
-    combined_df['scenario_name'] = combined_df['scenario_name'].fillna('Unknown')
-    combined_df['operation_name'] = combined_df['operation_name'].fillna(combined_df['operation'])
+    # Добавляем читаемые названия (категориальные колонки)
+    combined_df['method_name'] = _map_categorical(combined_df['method'], METHOD_NAMES,
+                                                  lambda method: 'Unknown')
+    combined_df['scenario_name'] = _map_categorical(combined_df['scenario'], SCENARIO_NAMES,
+                                                    lambda scenario: 'Unknown')
+    combined_df['operation_name'] = _map_categorical(combined_df['operation'], OPERATION_NAMES,
+                                                     lambda operation: operation)
 
     print(f"\n ФИНАЛЬНАЯ СТАТИСТИКА ДО ФИЛЬТРАЦИИ:")
     print(f"   Всего записей: {len(combined_df)}")
-    print(f"   Задержки: {combined_df['latency_us'].min():.1f} - {combined_df['latency_us'].max():.1f} мкс")
-    print(f"   Медиана: {combined_df['latency_us'].median():.1f} мкс")
+    per_op = ns_per_op(combined_df)
+    if len(per_op):
+        print(f"   Время на операцию: {per_op.min():.1f} - {per_op.max():.1f} нс")
+        print(f"   Медиана: {np.median(per_op):.1f} нс/оп")
+    del per_op
 
     # Анализ операций перед фильтрацией
     print(f"\n АНАЛИЗ ОПЕРАЦИЙ ДО ФИЛЬТРАЦИИ:")
-    for operation in combined_df['operation'].unique():
-        op_data = combined_df[combined_df['operation'] == operation]
-        print(f"   {operation}: {len(op_data)} записей, "
-              f"медиана: {op_data['latency_us'].median():.2f} мкс")
+    _print_operation_overview(combined_df)
 
     # ФИЛЬТРАЦИЯ ВЫБРОСОВ
     print(f"\n🗑️ ФИЛЬТРАЦИЯ ВЫБРОСОВ:")
     before_filter = len(combined_df)
 
-    # Разные пределы для разных операций
-    limits = {
-        'insert': 500,  # 500 μs (суммарное время для N операций)
-        'upsert': 500,  # 500 μs
-        'stl_insert': 500,  # 500 μs
-        'find': 20,  # 20 μs (нормализованное время на операцию)
-        'erase': 20,  # 20 μs (нормализованное время на операцию)
-        'find_existing': 20,  # 20 μs
-        'find_missing': 30,  # 30 μs
-        'stl_find': 5  # 5 μs
-    }
-
-    filtered_dfs = []
-    for operation, limit in limits.items():
-        op_data = combined_df[combined_df['operation'] == operation]
-        if len(op_data) > 0:
-            filtered = op_data[op_data['latency_us'] <= limit]
-            removed = len(op_data) - len(filtered)
-            if removed > 0:
-                print(f"   {operation}: удалено {removed} выбросов (> {limit} мкс)")
-            filtered_dfs.append(filtered)
-        else:
-            # Если операции нет в данных, добавляем пустой DataFrame
-            filtered_dfs.append(pd.DataFrame(columns=combined_df.columns))
-
-    combined_df = pd.concat(filtered_dfs, ignore_index=True)
+    combined_df, dropped = filter_outliers(combined_df, outlier_method, outlier_threshold)
+    for _, row in dropped[dropped['dropped'] > 0].iterrows():
+        print(f"   {row['operation']}/{row['scenario']}/N={row['n']}/method={row['method']}: "
+              f"удалено {int(row['dropped'])} из {int(row['count'])} "
+              f"(допустимо: [{row['lower_ns'] / 1000.0:.3f}; {row['upper_ns'] / 1000.0:.3f}] мкс)")
     after_filter = len(combined_df)
     print(f"📊 Итог фильтрации: {before_filter} → {after_filter} записей")
 
+    # Метрики на одну операцию: единые единицы для вставки (сумма за N) и поиска/удаления (среднее)
+    with PROFILER.stage('operation_metrics'):
+        add_operation_metrics(combined_df)
+
     # Анализ после фильтрации
     print(f"\n СТАТИСТИКА ПОСЛЕ ФИЛЬТРАЦИИ:")
-    for operation in combined_df['operation'].unique():
-        op_data = combined_df[combined_df['operation'] == operation]
-        if len(op_data) > 0:
-            print(f"   {operation}: {len(op_data)} записей, "
-                  f"медиана: {op_data['latency_us'].median():.2f} мкс")
+    _print_operation_overview(combined_df)
 
     return combined_df
 
 
-def create_latency_distributions(df, output_pdf="hash_table_performance_analysis.pdf"):
-    """Создание графиков распределения задержек"""
+# Квантили сводной таблицы статистик
+STAT_QUANTILES = {'median_ns': 0.5, 'p95_ns': 0.95}
 
-    print(f"\n Создание графиков в {output_pdf}...")
 
-    with PdfPages(output_pdf) as pdf:
+@profiled('compute_group_stats')
+def compute_group_stats(df):
+    """Статистики задержек для каждой группы (operation, scenario, n, method) за один проход"""
+    grouped = df.groupby(GROUP_KEYS, observed=True, sort=True)['latency_ns']
 
-        # 1. Сравнение методов пробирования для вставки (случайные данные)
-        print(" График 1: Сравнение методов вставки")
-        plt.figure(figsize=(14, 10))
-
-        insert_random = df[(df['operation'] == 'insert') & (df['scenario'] == 'random')]
-        print(f"   Данные для графика: {len(insert_random)} записей")
-
-        has_data = False
-        for method in [0, 1, 2]:
-            method_data = insert_random[insert_random['method'] == method]
-            if len(method_data) > 0:
-                has_data = True
-                # Используем разумное усечение для лучшей визуализации
-                cutoff = np.percentile(method_data['latency_us'], 95)
-                trimmed_data = method_data[method_data['latency_us'] <= cutoff]
-
-                sns.histplot(
-                    data=trimmed_data,
-                    x='latency_us',
-                    label=f"{METHOD_NAMES[method]} (n={len(trimmed_data)})",
-                    color=METHOD_COLORS[method],
-                    alpha=0.7,
-                    bins=50,
-                    kde=True,
-                    stat='density'
-                )
-
-        if has_data:
-            plt.title('Распределение задержек вставки: Сравнение методов пробирования\n(Случайные данные, N=1024)',
-                      fontsize=16, fontweight='bold')
-            plt.xlabel('Задержка (микросекунды)', fontsize=14)
-            plt.ylabel('Плотность вероятности', fontsize=14)
-            plt.legend(fontsize=12)
-            plt.grid(True, alpha=0.3)
-            plt.tight_layout()
-            pdf.savefig()
-            plt.close()
-        else:
-            print("    Нет данных для графика 1")
-
-        # 2. Сравнение сценариев данных для Double Hashing
-        print(" График 2: Сравнение сценариев данных")
-        plt.figure(figsize=(14, 10))
-
-        double_hashing_data = df[(df['operation'] == 'insert') & (df['method'] == 0)]
-        print(f"   Данные для графика: {len(double_hashing_data)} записей")
-
-        scenarios = ['random', 'ascending', 'clustered', 'high_collision']
-        colors = ['steelblue', 'orange', 'red', 'purple']
-
-        has_data = False
-        for scenario, color in zip(scenarios, colors):
-            scenario_data = double_hashing_data[double_hashing_data['scenario'] == scenario]
-            if len(scenario_data) > 0:
-                has_data = True
-                cutoff = np.percentile(scenario_data['latency_us'], 95)
-                trimmed_data = scenario_data[scenario_data['latency_us'] <= cutoff]
-
-                sns.histplot(
-                    data=trimmed_data,
-                    x='latency_us',
-                    label=f"{SCENARIO_NAMES[scenario]} (n={len(trimmed_data)})",
-                    color=color,
-                    alpha=0.7,
-                    bins=50,
-                    kde=True,
-                    stat='density'
-                )
-
-        if has_data:
-            plt.title('Распределение задержек вставки: Влияние распределения ключей\n(Double Hashing, N=1024)',
-                      fontsize=16, fontweight='bold')
-            plt.xlabel('Задержка (микросекунды)', fontsize=14)
-            plt.ylabel('Плотность вероятности', fontsize=14)
-            plt.legend(fontsize=12)
-            plt.grid(True, alpha=0.3)
-            plt.tight_layout()
-            pdf.savefig()
-            plt.close()
-        else:
-            print("   ️ Нет данных для графика 2")
-
-        # 3. Сравнение операций поиска и удаления (нормализованное время)
-        print("📈 График 3: Сравнение операций поиска и удаления")
-        plt.figure(figsize=(14, 10))
-
-        normalized_ops = df[(df['scenario'] == 'random') &
-                            (df['method'] == 2) &  # Quadratic
-                            (df['operation'].isin(['find', 'erase', 'find_existing', 'find_missing']))]
-        print(f"   Данные для графика: {len(normalized_ops)} записей")
-
-        operations = ['find', 'erase', 'find_existing', 'find_missing']
-        op_names = ['Поиск (все)', 'Удаление', 'Поиск (существ.)', 'Поиск (отсутств.)']
-        colors = ['green', 'red', 'blue', 'orange']
-
-        has_data = False
-        for op, op_name, color in zip(operations, op_names, colors):
-            op_data = normalized_ops[normalized_ops['operation'] == op]
-            if len(op_data) > 0:
-                has_data = True
-                # Более агрессивное усечение для нормализованных данных
-                cutoff = np.percentile(op_data['latency_us'], 99)
-                trimmed_data = op_data[op_data['latency_us'] <= cutoff]
-
-                print(f"   {op_name}: {len(trimmed_data)} записей, "
-                      f"медиана: {trimmed_data['latency_us'].median():.3f} мкс")
-
-                sns.histplot(
-                    data=trimmed_data,
-                    x='latency_us',
-                    label=f"{op_name} (n={len(trimmed_data)})",
-                    color=color,
-                    alpha=0.7,
-                    bins=30,
-                    kde=True,
-                    stat='density'
-                )
-
-        if has_data:
-            plt.title('Сравнение задержек операций поиска и удаления\n(Quadratic Probing, Случайные данные, N=1024)',
-                      fontsize=16, fontweight='bold')
-            plt.xlabel('Задержка на операцию (микросекунды)', fontsize=14)
-            plt.ylabel('Плотность вероятности', fontsize=14)
-            plt.legend(fontsize=12)
-            plt.grid(True, alpha=0.3)
-            plt.tight_layout()
-            pdf.savefig()
-            plt.close()
-        else:
-            print("   ️ Нет данных для графика 3")
-
-        # 4. Сравнение с STL
-        print("📈 График 4: Сравнение с STL")
-        plt.figure(figsize=(14, 10))
-
-        stl_comparison = df[((df['operation'] == 'insert') & (df['scenario'] == 'random')) |
-                            (df['operation'] == 'stl_insert')]
-        print(f"   Данные для графика: {len(stl_comparison)} записей")
-
-        custom_hash = stl_comparison[(stl_comparison['operation'] == 'insert') &
-                                     (stl_comparison['method'] == 2)]  # Quadratic
-        stl_hash = stl_comparison[stl_comparison['operation'] == 'stl_insert']
-
-        if len(custom_hash) > 0 and len(stl_hash) > 0:
-            cutoff_custom = np.percentile(custom_hash['latency_us'], 95)
-            cutoff_stl = np.percentile(stl_hash['latency_us'], 95)
-
-            trimmed_custom = custom_hash[custom_hash['latency_us'] <= cutoff_custom]
-            trimmed_stl = stl_hash[stl_hash['latency_us'] <= cutoff_stl]
-
-            plt.hist(trimmed_custom['latency_us'], bins=50, alpha=0.7, color='blue',
-                     label=f'Кастомная хэш-таблица (Quadratic) (n={len(trimmed_custom)})', density=True)
-            plt.hist(trimmed_stl['latency_us'], bins=50, alpha=0.7, color='red',
-                     label=f'STL unordered_map (n={len(trimmed_stl)})', density=True)
-
-            plt.title('Сравнение производительности: Кастомная vs STL реализация\n(Вставка, Случайные данные, N=1024)',
-                      fontsize=16, fontweight='bold')
-            plt.xlabel('Задержка (микросекунды)', fontsize=14)
-            plt.ylabel('Плотность вероятности', fontsize=14)
-            plt.legend(fontsize=12)
-            plt.grid(True, alpha=0.3)
-            plt.tight_layout()
-            pdf.savefig()
-            plt.close()
+    stats = grouped.agg(['count', 'mean', 'std', 'min', 'max'])
+    stats.columns = ['count', 'mean_ns', 'std_ns', 'min_ns', 'max_ns']
+
+    quantiles = grouped.quantile(list(STAT_QUANTILES.values())).unstack()
+    quantiles.columns = list(STAT_QUANTILES)
+    stats = stats.join(quantiles)
+
+    stats = stats[['count', 'mean_ns', 'std_ns', 'min_ns', 'median_ns', 'p95_ns', 'max_ns']].reset_index()
+    return add_group_metrics(stats)
+
+
+def select_stats(stats, **conditions):
+    """Строки таблицы статистик, удовлетворяющие условиям на ключи группы"""
+    mask = np.ones(len(stats), dtype=bool)
+    for column, value in conditions.items():
+        if isinstance(value, (list, tuple, set)):
+            mask &= stats[column].isin(value).to_numpy()
         else:
-            print("   ⚠ Недостаточно данных для сравнения с STL")
-
-        # 5. Bar chart средних задержек вставки
-        print(" График 5: Средние задержки вставки по методам")
-        plt.figure(figsize=(12, 8))
-
-        insert_random = df[(df['operation'] == 'insert') & (df['scenario'] == 'random')]
-
-        methods = []
-        medians = []
-
-        for method in [0, 1, 2]:
-            method_data = insert_random[insert_random['method'] == method]
-            if len(method_data) > 0:
-                methods.append(METHOD_NAMES[method])
-                medians.append(method_data['latency_us'].median())
-
-        if methods:
-            x = np.arange(len(methods))
-
-            bars = plt.bar(x, medians, alpha=0.7,
-                           color=['steelblue', 'coral', 'green'],
-                           width=0.6)
-
-            plt.title('Сравнение задержек вставки по методам\n(Случайные данные, N=1024)',
-                      fontsize=16, fontweight='bold')
-            plt.xlabel('Метод пробирования', fontsize=14)
-            plt.ylabel('Задержка (микросекунды)', fontsize=14)
-            plt.xticks(x, methods)
-
-            # Добавление значений на столбцы
-            for i, (bar, median) in enumerate(zip(bars, medians)):
-                height = bar.get_height()
-                plt.text(bar.get_x() + bar.get_width() / 2., height + 1,
-                         f'{median:.1f}', ha='center', va='bottom', fontsize=12)
-
-            plt.grid(True, alpha=0.3, axis='y')
-            plt.tight_layout()
-            pdf.savefig()
-            plt.close()
+            mask &= (stats[column] == value).to_numpy()
+    return stats[mask]
+
+
+def export_group_stats(stats, output_path):
+    """Экспорт таблицы статистик в CSV или JSON (по расширению файла)"""
+    output_path = Path(output_path)
+    table = stats.copy()
+    for column in GROUP_KEYS:
+        if isinstance(table[column].dtype, pd.CategoricalDtype):
+            table[column] = table[column].astype(str)
+
+    if output_path.suffix.lower() == '.json':
+        table.to_json(output_path, orient='records', indent=2, force_ascii=False)
+    else:
+        table.to_csv(output_path, index=False)
+    print(f" Таблица статистик сохранена: {output_path.absolute()}")
+
+
+# Локальное хранилище результатов (SQLite): метаданные запусков и статистики групп каждого запуска.
+# По умолчанию одно на проект - рядом со скриптом, а не в текущей директории
+RESULTS_DB_DEFAULT = Path(__file__).resolve().parent / "hash_table_results.sqlite"
+STORE_STAT_COLUMNS = ['count', 'mean_ns', 'std_ns', 'min_ns', 'median_ns', 'p95_ns', 'max_ns']
+RESULTS_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fingerprint TEXT NOT NULL UNIQUE,
+    recorded_at TEXT NOT NULL,
+    data_time TEXT NOT NULL,
+    label TEXT,
+    git_commit TEXT,
+    directories TEXT NOT NULL,
+    files INTEGER NOT NULL,
+    records INTEGER NOT NULL,
+    outlier_filter TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS group_stats (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    operation TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    method INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    mean_ns REAL,
+    std_ns REAL,
+    min_ns REAL,
+    median_ns REAL,
+    p95_ns REAL,
+    max_ns REAL,
+    PRIMARY KEY (run_id, operation, scenario, n, method)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS group_stats_series ON group_stats (operation, scenario, n, method, run_id);
+"""
+
+
+def open_results_store(db_path):
+    """Подключение к хранилищу результатов (схема создаётся при первом обращении)"""
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(RESULTS_STORE_SCHEMA)
+    return conn
+
+
+def _run_fingerprint(csv_files, outlier_filter):
+    """Отпечаток запуска: отпечатки всех файлов задержек и настройки фильтрации"""
+    files = sorted((fp['path'], fp['size'], fp['mtime_ns'])
+                   for fp in (_file_fingerprint(file) for file in csv_files))
+    payload = json.dumps({'files': files, 'outlier_filter': outlier_filter})
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _git_commit(directory=Path(__file__).resolve().parent):
+    """Короткий хэш коммита git репозитория с исходниками бенчмарка (где лежит скрипт), None вне репозитория"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=directory,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None if result.returncode == 0 else None
+
+
+@profiled('record_run')
+def record_run(db_path, csv_files, stats, records, outlier_method='mad', outlier_threshold=None, label=None):
+    """Добавление запуска (статистики групп compute_group_stats и число записей) в хранилище;
+    уже записанный запуск (тот же отпечаток) пропускается"""
+    outlier_filter = f"{outlier_method}:{outlier_threshold if outlier_threshold is not None else 'default'}"
+    fingerprint = _run_fingerprint(csv_files, outlier_filter)
+    directories = sorted({str(file.parent.resolve()) for file in csv_files})
+
+    conn = open_results_store(db_path)
+    try:
+        existing = conn.execute("SELECT run_id FROM runs WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if existing is not None:
+            print(f" Запуск уже есть в хранилище {db_path} (run {existing[0]})")
+            return existing[0]
+
+        data_time = max(file.stat().st_mtime for file in csv_files)
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (fingerprint, recorded_at, data_time, label, git_commit, directories,"
+                " files, records, outlier_filter) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (fingerprint, time.strftime('%Y-%m-%dT%H:%M:%S'),
+                 time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(data_time)),
+                 label, _git_commit(), json.dumps(directories),
+                 len(csv_files), records, outlier_filter))
+            run_id = cursor.lastrowid
+            rows = zip([run_id] * len(stats), stats['operation'].astype(str), stats['scenario'].astype(str),
+                       stats['n'].astype(int).tolist(), stats['method'].astype(int).tolist(),
+                       stats['count'].astype(int).tolist(),
+                       *(stats[column].astype(float).tolist() for column in STORE_STAT_COLUMNS[1:]))
+            conn.executemany(f"INSERT INTO group_stats VALUES ({', '.join(['?'] * (5 + len(STORE_STAT_COLUMNS)))})",
+                             rows)
+        print(f" Запуск записан в хранилище {db_path} (run {run_id}, групп: {len(stats)})")
+        return run_id
+    finally:
+        conn.close()
+
+
+def query_runs(db_path, last=None):
+    """Метаданные запусков в порядке записи (последние last)"""
+    conn = open_results_store(db_path)
+    try:
+        runs = pd.read_sql_query("SELECT * FROM runs ORDER BY run_id", conn)
+    finally:
+        conn.close()
+    return runs.tail(last).reset_index(drop=True) if last else runs
+
+
+def query_trend(db_path, metric='p95_ns', last=50, **conditions):
+    """Значения статистики по запускам для групп, удовлетворяющих условиям (без чтения исходных CSV).
+
+    value - статистика на одну операцию (нс/оп, см. OPERATION_SEMANTICS).
+    """
+    if metric not in STORE_STAT_COLUMNS:
+        raise ValueError(f"Неизвестная статистика: {metric}")
+
+    where = ["g.run_id IN (SELECT run_id FROM runs ORDER BY run_id DESC LIMIT ?)"]
+    params = [last if last else -1]
+    for column, value in conditions.items():
+        if value is None:
+            continue
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        where.append(f"g.{column} IN ({', '.join(['?'] * len(values))})")
+        params.extend(values)
+
+    query = (f"SELECT g.run_id, r.recorded_at, r.data_time, r.label, r.git_commit,"
+             f" g.operation, g.scenario, g.n, g.method, g.count, g.{metric} AS value"
+             f" FROM group_stats g JOIN runs r ON r.run_id = g.run_id"
+             f" WHERE {' AND '.join(where)}"
+             f" ORDER BY g.operation, g.scenario, g.n, g.method, g.run_id")
+    conn = open_results_store(db_path)
+    try:
+        trend = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+    trend['value'] = trend['value'] / ops_per_measurement(trend['operation'], trend['n'])
+    return trend
+
+
+def _run_label(row):
+    """Подпись запуска на графиках и в таблицах: метка, коммит или номер"""
+    for column in ['label', 'git_commit']:
+        if pd.notna(row[column]) and row[column]:
+            return str(row[column])
+    return f"run {row['run_id']}"
+
+
+def print_trend_summary(trend, metric):
+    """Изменение статистики от первого до последнего запуска для каждой группы"""
+    print("\n" + "=" * 60)
+    print(f"ИСТОРИЯ: {metric}, нс/оп")
+    print("=" * 60)
+    print(f"{'операция':<14}{'сценарий':<16}{'N':>8}  {'метод':<18}{'запусков':>9}"
+          f"{'первый':>10}{'последний':>11}{'мин':>10}{'макс':>10}{'изм.':>8}")
+    for (operation, scenario, n, method), series in trend.groupby(GROUP_KEYS, sort=True):
+        values = series['value'].to_numpy(dtype=np.float64)
+        change = values[-1] / values[0] - 1.0 if values[0] > 0 else np.nan
+        print(f"{operation:<14}{scenario:<16}{n:>8}  {METHOD_NAMES.get(method, 'Unknown'):<18}{len(values):>9}"
+              f"{values[0]:>10.1f}{values[-1]:>11.1f}{np.nanmin(values):>10.1f}{np.nanmax(values):>10.1f}"
+              f"{change:>+8.1%}")
+
+
+def create_trend_report(trend, metric, output_pdf="hash_table_history.pdf"):
+    """Линии тренда статистики по запускам: страница на операцию, линия на группу"""
+    _import_plotting()
+    print(f"\n Создание графиков истории в {output_pdf}...")
+    runs = trend.drop_duplicates('run_id').sort_values('run_id')
+    position = {run_id: i for i, run_id in enumerate(runs['run_id'])}
+    labels = [_run_label(row) for _, row in runs.iterrows()]
+    tick_step = max(1, len(labels) // 25)
+
+    with PdfPages(output_pdf) as pdf:
+        for operation, panel in trend.groupby('operation', sort=True):
+            fig, ax = plt.subplots(figsize=(16, 8))
+            for (scenario, n, method), series in panel.groupby(['scenario', 'n', 'method'], sort=True):
+                ax.plot(series['run_id'].map(position), series['value'], marker='o', markersize=3,
+                        color=METHOD_COLORS.get(method, 'gray'),
+                        label=f"{METHOD_NAMES.get(method, 'Unknown')}, {SCENARIO_NAMES.get(scenario, scenario)}, "
+                              f"N={n}")
+
+            ax.set_xticks(range(0, len(labels), tick_step))
+            ax.set_xticklabels(labels[::tick_step], rotation=45, ha='right', fontsize=9)
+            ax.set_xlabel('Запуск', fontsize=14)
+            ax.set_ylabel(f'{metric} на операцию (наносекунды)', fontsize=14)
+            ax.set_title(f"История: {OPERATION_NAMES.get(operation, operation)} ({len(labels)} запусков)",
+                         fontsize=16, fontweight='bold')
+            ax.grid(True, alpha=0.3)
+            ax.legend(fontsize=9)
+            fig.tight_layout()
+            pdf.savefig(fig)
+            plt.close(fig)
+
+
+# Семейства Google Benchmark: операция в CSV, имена аргументов (None - не используется), коды сценариев
+BENCHMARK_FAMILIES = {
+    'BM_Insert_Scenarios': ('insert', ('n', 'scenario', 'method'),
+                            ('random', 'ascending', 'clustered', 'high_collision')),
+    'BM_Find': ('find', ('n', 'method'), None),
+    'BM_Find_Existing': ('find_existing', ('n', 'method'), None),
+    'BM_Find_Missing': ('find_missing', ('n', 'method'), None),
+    'BM_Erase': ('erase', ('n', 'method'), None),
+    'BM_Upsert': ('upsert', ('n', 'method'), None),
+    'BM_STL_Compare': ('stl_insert', ('n', 'scenario'), ('random', 'clustered')),
+    'BM_STL_Find': ('stl_find', ('n', None), None)
+}
+
+# Пользовательские счётчики state.counters и колонки, в которые они попадают
+BENCHMARK_COUNTERS = {
+    'Collisions': 'collisions',
+    'LoadFactor': 'load_factor',
+    'UniqueKeys': 'unique_keys',
+    'TableSize': 'table_size'
+}
+
+# Модификаторы в имени бенчмарка, не являющиеся аргументами (repeats:3, threads:1, ...)
+BENCHMARK_NAME_MODIFIERS = {'repeats', 'min_time', 'min_warmup_time', 'iterations', 'threads'}
+TIME_UNIT_NS = {'ns': 1.0, 'us': 1e3, 'ms': 1e6, 's': 1e9}
+
+
+def _parse_benchmark_name(run_name):
+    """Семейство и числовые аргументы из имени вида BM_Insert_Scenarios/1024/0/1/repeats:3"""
+    parts = run_name.split('/')
+    args = []
+    for part in parts[1:]:
+        key, _, value = part.rpartition(':')
+        if key in BENCHMARK_NAME_MODIFIERS:
+            continue
+        try:
+            args.append(int(value))
+        except ValueError:
+            continue
+    return parts[0], args
+
+
+def benchmark_json_files(data_dir):
+    """JSON файлы --benchmark_out в директории или списке директорий (другие JSON пропускаются)"""
+    files = []
+    for file in sorted(file for directory in data_directories(data_dir) for file in directory.glob("*.json")):
+        try:
+            report = json.loads(file.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        if isinstance(report, dict) and isinstance(report.get('benchmarks'), list):
+            files.append(file)
+    return files
+
+
+def load_benchmark_counters(json_files):
+    """Счётчики и время из JSON Google Benchmark, усреднённые по повторам конфигурации"""
+    rows = []
+    for file in json_files:
+        report = json.loads(Path(file).read_text(encoding='utf-8'))
+        skipped = set()
+        for bench in report.get('benchmarks', []):
+            if bench.get('run_type', 'iteration') != 'iteration' or bench.get('error_occurred'):
+                continue
+
+            family, args = _parse_benchmark_name(bench.get('run_name', bench['name']))
+            if family not in BENCHMARK_FAMILIES:
+                skipped.add(family)
+                continue
+
+            operation, arg_names, scenarios = BENCHMARK_FAMILIES[family]
+            config = {name: value for name, value in zip(arg_names, args) if name is not None}
+            if 'n' not in config:
+                skipped.add(family)
+                continue
+
+            unit = TIME_UNIT_NS.get(bench.get('time_unit', 'ns'), 1.0)
+            row = {
+                'operation': operation,
+                'scenario': scenarios[config['scenario']] if 'scenario' in config else 'random',
+                'n': config['n'],
+                'method': config.get('method', -1),
+                'real_time_ns': bench.get('real_time', np.nan) * unit,
+                'cpu_time_ns': bench.get('cpu_time', np.nan) * unit,
+                'iterations': bench.get('iterations', np.nan)
+            }
+            for counter, column in BENCHMARK_COUNTERS.items():
+                row[column] = bench.get(counter, np.nan)
+            rows.append(row)
+
+        print(f" Загружен JSON бенчмарков: {Path(file).name}")
+        if skipped:
+            print(f"    Пропущены семейства без конфигурации задержек: {', '.join(sorted(skipped))}")
+
+    columns = ['real_time_ns', 'cpu_time_ns', 'iterations'] + list(BENCHMARK_COUNTERS.values())
+    if not rows:
+        return pd.DataFrame(columns=GROUP_KEYS + ['repetitions'] + columns)
+
+    counters = pd.DataFrame(rows)
+    grouped = counters.groupby(GROUP_KEYS, sort=True)
+    result = grouped[columns].mean()
+    result.insert(0, 'repetitions', grouped.size())
+    return result.reset_index()
+
+
+def join_benchmark_counters(stats, counters):
+    """Присоединение счётчиков к таблице статистик по конфигурации и производные метрики.
+
+    collisions_per_key - дополнительных проб на вставленный ключ, ns_per_probe - медианное
+    время одной операции, делённое на число проб (1 + collisions_per_key).
+    """
+    counters = counters.copy()
+    for column in GROUP_KEYS:
+        counters[column] = counters[column].astype(stats[column].dtype)
+
+    joined = stats.merge(counters, on=GROUP_KEYS, how='left')
+    joined['collisions_per_key'] = joined['collisions'] / joined['n']
+    joined['ns_per_probe'] = joined['median_ns_per_op'] / (1.0 + joined['collisions_per_key'])
+    return joined
+
+
+def counter_correlations(joined):
+    """Связь коллизий и задержки по (операция, метод) между конфигурациями сценария и N.
+
+    slope_ns_per_collision - наклон линейной аппроксимации ns/op от коллизий на ключ,
+    т.е. оценка стоимости одной дополнительной пробы.
+    """
+    rows = []
+    measured = joined[joined['collisions'].notna()]
+    for (operation, method), group in measured.groupby(['operation', 'method'], observed=True, sort=True):
+        x = group['collisions_per_key'].to_numpy(dtype=np.float64)
+        y = group['median_ns_per_op'].to_numpy(dtype=np.float64)
+        varying = len(group) >= 2 and np.ptp(x) > 0
+        rows.append({
+            'operation': operation,
+            'method': method,
+            'configs': len(group),
+            'collisions_per_key': x.mean(),
+            'load_factor': group['load_factor'].mean(),
+            'median_ns_per_op': y.mean(),
+            'ns_per_probe': group['ns_per_probe'].mean(),
+            'pearson_r': np.corrcoef(x, y)[0, 1] if varying and len(group) >= 3 and np.ptp(y) > 0 else np.nan,
+            'slope_ns_per_collision': np.polyfit(x, y, 1)[0] if varying else np.nan
+        })
+    return pd.DataFrame(rows, columns=['operation', 'method', 'configs', 'collisions_per_key', 'load_factor',
+                                       'median_ns_per_op', 'ns_per_probe', 'pearson_r',
+                                       'slope_ns_per_collision'])
+
+
+class LatencySketch:
+    """Логарифмическая гистограмма задержек (HDR-подобная) с ограниченной относительной ошибкой.
+
+    Значение v >= 1 нс попадает в корзину ceil(log_gamma(v)) + 1, корзина 0 отведена под ноль.
+    Память постоянна и не зависит от числа измерений, а два скетча с одинаковыми
+    параметрами объединяются сложением счётчиков.
+    """
+
+    def __init__(self, relative_error=0.01, max_value_ns=10 ** 13):
+        self.relative_error = relative_error
+        self.max_value_ns = max_value_ns
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self.num_buckets = int(np.ceil(np.log(max_value_ns) / np.log(self.gamma))) + 2
+        self.counts = np.zeros(self.num_buckets, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def bucket_indices(self, values):
+        """Номера корзин для массива задержек"""
+        values = np.clip(np.asarray(values, dtype=np.float64), 0, self.max_value_ns)
+        indices = np.zeros(len(values), dtype=np.int64)
+        positive = values >= 1
+        indices[positive] = np.ceil(np.log(values[positive]) / np.log(self.gamma)).astype(np.int64) + 1
+        return indices
+
+    def add_counts(self, bucket_counts, count, total, total_sq, min_value, max_value):
+        """Добавление предварительно посчитанных корзин и моментов"""
+        self.counts += bucket_counts
+        self.count += int(count)
+        self.total += float(total)
+        self.total_sq += float(total_sq)
+        self.min = min(self.min, min_value)
+        self.max = max(self.max, max_value)
+
+    def add(self, values):
+        """Добавление массива задержек в наносекундах"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        bucket_counts = np.bincount(self.bucket_indices(values), minlength=self.num_buckets)
+        self.add_counts(bucket_counts, len(values), values.sum(), np.square(values).sum(),
+                        values.min(), values.max())
+
+    def merge(self, other):
+        """Объединение со скетчем другого файла или процесса"""
+        if other.num_buckets != self.num_buckets or other.gamma != self.gamma:
+            raise ValueError("Нельзя объединить скетчи с разными параметрами")
+        self.add_counts(other.counts, other.count, other.total, other.total_sq, other.min, other.max)
+        return self
+
+    def quantiles(self, qs):
+        """Приближённые квантили (относительная ошибка не больше relative_error)"""
+        if self.count == 0:
+            return np.full(len(qs), np.nan)
+        cumulative = np.cumsum(self.counts)
+        ranks = np.asarray(qs, dtype=np.float64) * (self.count - 1)
+        buckets = np.searchsorted(cumulative, ranks, side='right')
+        values = np.where(buckets == 0, 0.0,
+                          2.0 * self.gamma ** (buckets - 1.0) / (self.gamma + 1.0))
+        return np.clip(values, self.min, self.max)
+
+    def mean(self):
+        return self.total / self.count if self.count else np.nan
+
+    def std(self):
+        if self.count < 2:
+            return np.nan
+        variance = (self.total_sq - self.total ** 2 / self.count) / (self.count - 1)
+        return float(np.sqrt(max(variance, 0.0)))
+
+
+# Квантили, которые выдаёт потоковый режим
+SKETCH_QUANTILES = {'median_ns': 0.5, 'p95_ns': 0.95, 'p99_ns': 0.99, 'p999_ns': 0.999}
+STREAM_CHUNK_SIZE = 1_000_000
+
+
+def _merge_sketches(target, sketches):
+    """Слияние словаря скетчей {группа: LatencySketch} в target"""
+    for key, sketch in sketches.items():
+        if key in target:
+            target[key].merge(sketch)
         else:
-            print("   ️ Нет данных для bar chart")
-
-        # 6. Сравнение STL поиска с кастомной реализацией
-        print(" График 6: Сравнение поиска STL vs кастомная")
-        plt.figure(figsize=(14, 10))
-
-        search_comparison = df[((df['operation'] == 'find') & (df['scenario'] == 'random') & (df['method'] == 2)) |
-                               (df['operation'] == 'stl_find')]
-        print(f"   Данные для графика: {len(search_comparison)} записей")
-
-        custom_search = search_comparison[search_comparison['operation'] == 'find']
-        stl_search = search_comparison[search_comparison['operation'] == 'stl_find']
-
-        if len(custom_search) > 0 and len(stl_search) > 0:
-            cutoff_custom = np.percentile(custom_search['latency_us'], 95)
-            cutoff_stl = np.percentile(stl_search['latency_us'], 95)
-
-            trimmed_custom = custom_search[custom_search['latency_us'] <= cutoff_custom]
-            trimmed_stl = stl_search[stl_search['latency_us'] <= cutoff_stl]
-
-            plt.hist(trimmed_custom['latency_us'], bins=50, alpha=0.7, color='blue',
-                     label=f'Кастомная (Quadratic) (n={len(trimmed_custom)})', density=True)
-            plt.hist(trimmed_stl['latency_us'], bins=50, alpha=0.7, color='red',
-                     label=f'STL unordered_map (n={len(trimmed_stl)})', density=True)
-
-            plt.title('Сравнение производительности поиска: Кастомная vs STL\n(Случайные данные, N=1024)',
-                      fontsize=16, fontweight='bold')
-            plt.xlabel('Задержка на операцию поиска (микросекунды)', fontsize=14)
-            plt.ylabel('Плотность вероятности', fontsize=14)
-            plt.legend(fontsize=12)
-            plt.grid(True, alpha=0.3)
-            plt.tight_layout()
-            pdf.savefig()
-            plt.close()
+            target[key] = sketch
+    return target
+
+
+def _fold_chunk_sketches(sketches, chunk, relative_error=0.01):
+    """Добавление куска строк CSV в скетчи {группа: LatencySketch}"""
+    if chunk.empty:
+        return sketches
+
+    template = LatencySketch(relative_error)
+    codes, groups = pd.MultiIndex.from_frame(chunk[GROUP_KEYS]).factorize()
+    values = chunk['latency_ns'].to_numpy(dtype=np.float64)
+
+    # Одна гистограмма на все группы куска: индекс = группа * корзин + корзина
+    flat = codes * template.num_buckets + template.bucket_indices(values)
+    bucket_counts = np.bincount(flat, minlength=len(groups) * template.num_buckets)
+    bucket_counts = bucket_counts.reshape(len(groups), template.num_buckets)
+
+    moments = pd.DataFrame({'v': values, 'sq': np.square(values)}).groupby(codes)
+    moments = moments.agg(count=('v', 'count'), total=('v', 'sum'), total_sq=('sq', 'sum'),
+                          min=('v', 'min'), max=('v', 'max'))
+
+    for code, key in enumerate(groups):
+        key = tuple(int(k) if isinstance(k, (int, np.integer)) else str(k) for k in key)
+        if key not in sketches:
+            sketches[key] = LatencySketch(relative_error)
+        m = moments.loc[code]
+        sketches[key].add_counts(bucket_counts[code], m['count'], m['total'], m['total_sq'],
+                                 m['min'], m['max'])
+    return sketches
+
+
+def _stream_file_sketches(file, chunksize=STREAM_CHUNK_SIZE, relative_error=0.01):
+    """Потоковое чтение CSV кусками и накопление скетчей по группам"""
+    if file.suffix == LATENCY_BIN_SUFFIX:
+        return _stream_bin_sketches(file, chunksize, relative_error)
+
+    header = pd.read_csv(file, nrows=0).columns
+    if not set(CSV_DTYPES).issubset(header):
+        print(f"    Пропущен {file.name}: нет нужных колонок")
+        return {}
+
+    categories = [column for column, dtype in CSV_DTYPES.items() if dtype == 'category']
+    try:
+        sketches = {}
+        rows = 0
+        reader = pd.read_csv(file, usecols=list(CSV_DTYPES), dtype=CSV_DTYPES, chunksize=chunksize)
+        for chunk in reader:
+            if chunk[categories].isna().any(axis=None):
+                chunk = _drop_incomplete_rows(chunk, CSV_DTYPES)
+            rows += len(chunk)
+            _fold_chunk_sketches(sketches, chunk, relative_error)
+    except (ValueError, TypeError):
+        # Повреждённые строки: второй проход с текстовыми типами, такие строки отбрасываются
+        text_dtypes = {column: dtype if dtype == 'category' else str
+                       for column, dtype in CSV_DTYPES.items()}
+        sketches = {}
+        rows = 0
+        reader = pd.read_csv(file, usecols=list(CSV_DTYPES), dtype=text_dtypes, chunksize=chunksize)
+        for chunk in reader:
+            chunk = _drop_incomplete_rows(chunk, CSV_DTYPES)
+            rows += len(chunk)
+            _fold_chunk_sketches(sketches, chunk, relative_error)
+
+    print(f" Обработан потоково: {file.name} ({rows} записей, {len(sketches)} групп)")
+    return sketches
+
+
+def _stream_bin_sketches(file, chunksize=STREAM_CHUNK_SIZE, relative_error=0.01):
+    """Скетчи по записям бинарного файла: массивы memmap читаются кусками"""
+    sketches = {}
+    rows = 0
+    for operation, scenario, n, method, latencies in iter_latency_records(file):
+        key = (operation, scenario, n, method)
+        if key not in sketches:
+            sketches[key] = LatencySketch(relative_error)
+        for start in range(0, len(latencies), chunksize):
+            sketches[key].add(latencies[start:start + chunksize])
+        rows += len(latencies)
+
+    print(f" Обработан потоково: {file.name} ({rows} записей, {len(sketches)} групп)")
+    return sketches
+
+
+@profiled('stream_group_sketches')
+def stream_group_sketches(csv_files, chunksize=STREAM_CHUNK_SIZE, jobs=1, relative_error=0.01):
+    """Скетчи задержек по группам без загрузки всех измерений в память"""
+    if jobs is None or jobs <= 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(csv_files))
+
+    merged = {}
+    if jobs <= 1:
+        for file in csv_files:
+            _merge_sketches(merged, _stream_file_sketches(file, chunksize, relative_error))
+        return merged
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for sketches in executor.map(_stream_file_sketches, csv_files,
+                                     [chunksize] * len(csv_files),
+                                     [relative_error] * len(csv_files)):
+            _merge_sketches(merged, sketches)
+    return merged
+
+
+def sketch_group_stats(sketches):
+    """Таблица статистик по группам из скетчей (те же колонки, что у compute_group_stats)"""
+    rows = []
+    for key in sorted(sketches):
+        sketch = sketches[key]
+        row = dict(zip(GROUP_KEYS, key))
+        row.update({
+            'count': sketch.count,
+            'mean_ns': sketch.mean(),
+            'std_ns': sketch.std(),
+            'min_ns': sketch.min,
+            'max_ns': sketch.max
+        })
+        row.update(zip(SKETCH_QUANTILES, sketch.quantiles(list(SKETCH_QUANTILES.values()))))
+        rows.append(row)
+
+    columns = GROUP_KEYS + ['count', 'mean_ns', 'std_ns', 'min_ns', 'median_ns', 'p95_ns',
+                            'p99_ns', 'p999_ns', 'max_ns']
+    return add_group_metrics(pd.DataFrame(rows, columns=columns))
+
+
+def print_quantile_table(stats):
+    """Таблица квантилей по всем группам"""
+    print("\n" + "=" * 60)
+    print("КВАНТИЛИ ВРЕМЕНИ ОПЕРАЦИИ ПО ГРУППАМ (нс/оп)")
+    print("=" * 60)
+    print(f"{'operation':<14}{'scenario':<16}{'n':>10}{'method':>7}{'count':>10}"
+          f"{'P50':>10}{'P95':>10}{'P99':>10}{'P99.9':>10}{'млн оп/с':>10}")
+    for _, row in stats.iterrows():
+        print(f"{row['operation']:<14}{row['scenario']:<16}{row['n']:>10}{row['method']:>7}"
+              f"{int(row['count']):>10}{row['median_ns_per_op']:>10.1f}{row['p95_ns_per_op']:>10.1f}"
+              f"{row['p99_ns_per_op']:>10.1f}{row['p999_ns_per_op']:>10.1f}{row['ops_per_sec'] / 1e6:>10.2f}")
+
+
+KDE_GRID_SIZE = 512
+# Внутренняя сетка KDE в KDE_OVERSAMPLING раз мельче выходной, ядро обрезается на KDE_KERNEL_WIDTH ширин
+KDE_OVERSAMPLING = 8
+KDE_KERNEL_WIDTH = 6
+
+
+def binned_distribution(values, bins=50, kde=True, grid_size=KDE_GRID_SIZE):
+    """Гистограмма плотности и KDE по бинированной сетке.
+
+    Измерения проходятся один раз (np.histogram и линейное бинирование на сетку),
+    KDE с гауссовым ядром и шириной по правилу Скотта считается свёрткой через FFT,
+    поэтому стоимость отрисовки не зависит от числа измерений. Свёртка идёт на сетке
+    в KDE_OVERSAMPLING раз мельче, выходная сетка - её каждый KDE_OVERSAMPLING-й узел.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    counts, edges = np.histogram(values, bins=bins)
+    widths = np.diff(edges)
+    density = counts / (counts.sum() * widths) if counts.sum() > 0 else counts.astype(np.float64)
+    dist = {'count': len(values), 'edges': edges, 'density': density, 'grid': None, 'kde': None}
+
+    std = values.std(ddof=1) if len(values) > 1 else 0.0
+    if not kde or std <= 0:
+        return dist
+
+    bandwidth = std * len(values) ** (-1.0 / 5.0)
+    low, high = values.min() - 3 * bandwidth, values.max() + 3 * bandwidth
+    fine_size = (grid_size - 1) * KDE_OVERSAMPLING + 1
+    grid = np.linspace(low, high, fine_size)
+    delta = grid[1] - grid[0]
+
+    # Линейное бинирование: каждое измерение делится между двумя соседними узлами сетки
+    position = (values - low) / delta
+    left = np.clip(np.floor(position).astype(np.int64), 0, fine_size - 2)
+    weight = position - left
+    binned = (np.bincount(left, 1.0 - weight, minlength=fine_size) +
+              np.bincount(left + 1, weight, minlength=fine_size))
+
+    # Гауссово ядро на той же сетке и свёртка через FFT
+    half_width = min(fine_size - 1, int(np.ceil(KDE_KERNEL_WIDTH * bandwidth / delta)))
+    offsets = np.arange(-half_width, half_width + 1) * delta
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    size = 1 << int(np.ceil(np.log2(fine_size + len(kernel) - 1)))
+    smoothed = np.fft.irfft(np.fft.rfft(binned, size) * np.fft.rfft(kernel, size), size)
+
+    dist['grid'] = grid[::KDE_OVERSAMPLING]
+    dist['kde'] = smoothed[half_width:half_width + fine_size:KDE_OVERSAMPLING] / len(values)
+    return dist
+
+
+def plot_binned_distribution(dist, label, color, alpha=0.7):
+    """Отрисовка предварительно посчитанной гистограммы и KDE"""
+    _import_plotting()
+    plt.stairs(dist['density'], dist['edges'], fill=True, alpha=alpha, color=color, label=label)
+    if dist['kde'] is not None:
+        plt.plot(dist['grid'], dist['kde'], color=color, linewidth=2)
+
+
+def _select_page_probing_methods(df, stats):
+    """Данные графика 1: вставка, случайные ключи, методы пробирования"""
+    return df[(df['operation'] == 'insert') & (df['scenario'] == 'random')]
+
+
+def _render_page_probing_methods(insert_random):
+    """График 1: сравнение методов пробирования для вставки"""
+    fig = plt.figure(figsize=(14, 10))
+
+    has_data = False
+    for method in [0, 1, 2]:
+        method_data = insert_random[insert_random['method'] == method]
+        if len(method_data) > 0:
+            has_data = True
+            # Используем разумное усечение для лучшей визуализации
+            cutoff = np.percentile(method_data['ns_per_op'], 95)
+            trimmed_data = method_data[method_data['ns_per_op'] <= cutoff]
+
+            dist = binned_distribution(trimmed_data['ns_per_op'], bins=50)
+            plot_binned_distribution(dist, label=f"{METHOD_NAMES[method]} (n={len(trimmed_data)})",
+                                     color=METHOD_COLORS[method], alpha=0.7)
+
+    if not has_data:
+        plt.close(fig)
+        return None
+
+    plt.title('Распределение задержек вставки: Сравнение методов пробирования\n'
+              f'(Случайные данные, {n_label(insert_random)})',
+              fontsize=16, fontweight='bold')
+    plt.xlabel('Время на операцию (наносекунды)', fontsize=14)
+    plt.ylabel('Плотность вероятности', fontsize=14)
+    plt.legend(fontsize=12)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    return fig
+
+
+def _select_page_scenarios(df, stats):
+    """Данные графика 2: вставка, Double Hashing, все сценарии"""
+    return df[(df['operation'] == 'insert') & (df['method'] == 0)]
+
+
+def _render_page_scenarios(double_hashing_data):
+    """График 2: влияние распределения ключей"""
+    fig = plt.figure(figsize=(14, 10))
+
+    scenarios = ['random', 'ascending', 'clustered', 'high_collision']
+    colors = ['steelblue', 'orange', 'red', 'purple']
+
+    has_data = False
+    for scenario, color in zip(scenarios, colors):
+        scenario_data = double_hashing_data[double_hashing_data['scenario'] == scenario]
+        if len(scenario_data) > 0:
+            has_data = True
+            cutoff = np.percentile(scenario_data['ns_per_op'], 95)
+            trimmed_data = scenario_data[scenario_data['ns_per_op'] <= cutoff]
+
+            dist = binned_distribution(trimmed_data['ns_per_op'], bins=50)
+            plot_binned_distribution(dist, label=f"{SCENARIO_NAMES[scenario]} (n={len(trimmed_data)})",
+                                     color=color, alpha=0.7)
+
+    if not has_data:
+        plt.close(fig)
+        return None
+
+    plt.title('Распределение задержек вставки: Влияние распределения ключей\n'
+              f'(Double Hashing, {n_label(double_hashing_data)})',
+              fontsize=16, fontweight='bold')
+    plt.xlabel('Время на операцию (наносекунды)', fontsize=14)
+    plt.ylabel('Плотность вероятности', fontsize=14)
+    plt.legend(fontsize=12)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    return fig
+
+
+def _select_page_find_erase(df, stats):
+    """Данные графика 3: поиск и удаление, Quadratic Probing"""
+    return df[(df['scenario'] == 'random') &
+              (df['method'] == 2) &  # Quadratic
+              (df['operation'].isin(['find', 'erase', 'find_existing', 'find_missing']))]
+
+
+def _render_page_find_erase(normalized_ops):
+    """График 3: сравнение операций поиска и удаления (нормализованное время)"""
+    fig = plt.figure(figsize=(14, 10))
+
+    operations = ['find', 'erase', 'find_existing', 'find_missing']
+    op_names = ['Поиск (все)', 'Удаление', 'Поиск (существ.)', 'Поиск (отсутств.)']
+    colors = ['green', 'red', 'blue', 'orange']
+
+    has_data = False
+    for op, op_name, color in zip(operations, op_names, colors):
+        op_data = normalized_ops[normalized_ops['operation'] == op]
+        if len(op_data) > 0:
+            has_data = True
+            # Более агрессивное усечение для нормализованных данных
+            cutoff = np.percentile(op_data['ns_per_op'], 99)
+            trimmed_data = op_data[op_data['ns_per_op'] <= cutoff]
+
+            print(f"   {op_name}: {len(trimmed_data)} записей, "
+                  f"медиана: {trimmed_data['ns_per_op'].median():.1f} нс/оп")
+
+            dist = binned_distribution(trimmed_data['ns_per_op'], bins=30)
+            plot_binned_distribution(dist, label=f"{op_name} (n={len(trimmed_data)})",
+                                     color=color, alpha=0.7)
+
+    if not has_data:
+        plt.close(fig)
+        return None
+
+    plt.title('Сравнение задержек операций поиска и удаления\n'
+              f'(Quadratic Probing, Случайные данные, {n_label(normalized_ops)})',
+              fontsize=16, fontweight='bold')
+    plt.xlabel('Время на операцию (наносекунды)', fontsize=14)
+    plt.ylabel('Плотность вероятности', fontsize=14)
+    plt.legend(fontsize=12)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    return fig
+
+
+def _select_page_stl_insert(df, stats):
+    """Данные графика 4: вставка Quadratic Probing и STL"""
+    return df[((df['operation'] == 'insert') & (df['scenario'] == 'random') & (df['method'] == 2)) |
+              (df['operation'] == 'stl_insert')]
+
+
+def _render_page_stl_insert(stl_comparison):
+    """График 4: сравнение вставки с STL"""
+    custom_hash = stl_comparison[stl_comparison['operation'] == 'insert']
+    stl_hash = stl_comparison[stl_comparison['operation'] == 'stl_insert']
+
+    if len(custom_hash) == 0 or len(stl_hash) == 0:
+        return None
+
+    fig = plt.figure(figsize=(14, 10))
+
+    cutoff_custom = np.percentile(custom_hash['ns_per_op'], 95)
+    cutoff_stl = np.percentile(stl_hash['ns_per_op'], 95)
+
+    trimmed_custom = custom_hash[custom_hash['ns_per_op'] <= cutoff_custom]
+    trimmed_stl = stl_hash[stl_hash['ns_per_op'] <= cutoff_stl]
+
+    plot_binned_distribution(binned_distribution(trimmed_custom['ns_per_op'], bins=50, kde=False),
+                             label=f'Кастомная хэш-таблица (Quadratic) (n={len(trimmed_custom)})',
+                             color='blue', alpha=0.7)
+    plot_binned_distribution(binned_distribution(trimmed_stl['ns_per_op'], bins=50, kde=False),
+                             label=f'STL unordered_map (n={len(trimmed_stl)})',
+                             color='red', alpha=0.7)
+
+    plt.title('Сравнение производительности: Кастомная vs STL реализация\n'
+              f'(Вставка, Случайные данные, {n_label(stl_comparison)})',
+              fontsize=16, fontweight='bold')
+    plt.xlabel('Время на операцию (наносекунды)', fontsize=14)
+    plt.ylabel('Плотность вероятности', fontsize=14)
+    plt.legend(fontsize=12)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    return fig
+
+
+def _select_page_insert_medians(df, stats):
+    """Данные графика 5: строки таблицы статистик для вставки"""
+    return select_stats(stats, operation='insert', scenario='random', method=[0, 1, 2])
+
+
+def _render_page_insert_medians(insert_stats):
+    """График 5: bar chart медианных задержек вставки"""
+    several_n = insert_stats['n'].nunique() > 1
+
+    methods = []
+    medians = []
+    colors = []
+
+    for _, row in insert_stats.sort_values(['n', 'method']).iterrows():
+        label = METHOD_NAMES[row['method']]
+        methods.append(f"{label}\nN={row['n']}" if several_n else label)
+        medians.append(row['median_ns_per_op'])
+        colors.append(METHOD_COLORS[row['method']])
+
+    if not methods:
+        return None
+
+    fig = plt.figure(figsize=(12, 8))
+    x = np.arange(len(methods))
+
+    bars = plt.bar(x, medians, alpha=0.7,
+                   color=colors,
+                   width=0.6)
+
+    plt.title('Сравнение медианного времени вставки одного ключа по методам\n'
+              f'(Случайные данные, {n_label(insert_stats)})',
+              fontsize=16, fontweight='bold')
+    plt.xlabel('Метод пробирования', fontsize=14)
+    plt.ylabel('Время на операцию (наносекунды)', fontsize=14)
+    plt.xticks(x, methods)
+
+    # Добавление значений на столбцы
+    for i, (bar, median) in enumerate(zip(bars, medians)):
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width() / 2., height + 1,
+                 f'{median:.1f}', ha='center', va='bottom', fontsize=12)
+
+    plt.grid(True, alpha=0.3, axis='y')
+    plt.tight_layout()
+    return fig
+
+
+def _select_page_stl_find(df, stats):
+    """Данные графика 6: поиск Quadratic Probing и STL"""
+    return df[((df['operation'] == 'find') & (df['scenario'] == 'random') & (df['method'] == 2)) |
+              (df['operation'] == 'stl_find')]
+
+
+def _render_page_stl_find(search_comparison):
+    """График 6: сравнение поиска STL vs кастомная"""
+    custom_search = search_comparison[search_comparison['operation'] == 'find']
+    stl_search = search_comparison[search_comparison['operation'] == 'stl_find']
+
+    if len(custom_search) == 0 or len(stl_search) == 0:
+        return None
+
+    fig = plt.figure(figsize=(14, 10))
+
+    cutoff_custom = np.percentile(custom_search['ns_per_op'], 95)
+    cutoff_stl = np.percentile(stl_search['ns_per_op'], 95)
+
+    trimmed_custom = custom_search[custom_search['ns_per_op'] <= cutoff_custom]
+    trimmed_stl = stl_search[stl_search['ns_per_op'] <= cutoff_stl]
+
+    plot_binned_distribution(binned_distribution(trimmed_custom['ns_per_op'], bins=50, kde=False),
+                             label=f'Кастомная (Quadratic) (n={len(trimmed_custom)})',
+                             color='blue', alpha=0.7)
+    plot_binned_distribution(binned_distribution(trimmed_stl['ns_per_op'], bins=50, kde=False),
+                             label=f'STL unordered_map (n={len(trimmed_stl)})',
+                             color='red', alpha=0.7)
+
+    plt.title('Сравнение производительности поиска: Кастомная vs STL\n'
+              f'(Случайные данные, {n_label(search_comparison)})',
+              fontsize=16, fontweight='bold')
+    plt.xlabel('Время на операцию поиска (наносекунды)', fontsize=14)
+    plt.ylabel('Плотность вероятности', fontsize=14)
+    plt.legend(fontsize=12)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    return fig
+
+
+def _select_page_collisions(df, stats):
+    """Данные графика 7: строки статистик со счётчиками коллизий"""
+    if 'collisions' not in stats.columns:
+        return stats.iloc[:0]
+    columns = GROUP_KEYS + ['collisions_per_key', 'load_factor', 'median_ns_per_op', 'ns_per_probe']
+    return stats.loc[stats['collisions'].notna() & stats['method'].isin([0, 1, 2]), columns]
+
+
+def _render_page_collisions(collision_stats):
+    """График 7: задержка против коллизий на ключ и стоимость одной пробы по методам"""
+    if collision_stats.empty:
+        return None
+
+    fig, (ax_scatter, ax_probe) = plt.subplots(1, 2, figsize=(16, 8))
+    markers = {'insert': 'o', 'upsert': 's'}
+
+    for method in sorted(collision_stats['method'].unique()):
+        for operation in collision_stats['operation'].unique():
+            subset = collision_stats[(collision_stats['method'] == method) &
+                                     (collision_stats['operation'] == operation)]
+            if subset.empty:
+                continue
+            ax_scatter.scatter(subset['collisions_per_key'], subset['median_ns_per_op'],
+                               color=METHOD_COLORS[method], marker=markers.get(str(operation), 'D'),
+                               s=80, alpha=0.8, label=f"{METHOD_NAMES[method]} ({operation})")
+
+    ax_scatter.set_title('Задержка на операцию от числа коллизий', fontsize=14, fontweight='bold')
+    ax_scatter.set_xlabel('Коллизий на вставленный ключ', fontsize=12)
+    ax_scatter.set_ylabel('Медиана на операцию (нс)', fontsize=12)
+    ax_scatter.legend(fontsize=10)
+    ax_scatter.grid(True, alpha=0.3)
+
+    # Стоимость пробы: конфигурации по оси X, методы - соседние столбцы
+    configs = collision_stats[['operation', 'scenario', 'n']].drop_duplicates().sort_values(['operation', 'scenario', 'n'])
+    methods = sorted(collision_stats['method'].unique())
+    x = np.arange(len(configs))
+    width = 0.8 / len(methods)
+    for i, method in enumerate(methods):
+        subset = collision_stats[collision_stats['method'] == method]
+        values = configs.merge(subset, on=['operation', 'scenario', 'n'], how='left')['ns_per_probe']
+        ax_probe.bar(x + (i - (len(methods) - 1) / 2) * width, values, width,
+                     color=METHOD_COLORS[method], alpha=0.7, label=METHOD_NAMES[method])
+
+    ax_probe.set_title('Стоимость одной пробы', fontsize=14, fontweight='bold')
+    ax_probe.set_ylabel('нс на пробу', fontsize=12)
+    ax_probe.set_xticks(x)
+    ax_probe.set_xticklabels([f"{row.operation}\n{row.scenario}\nN={row.n}" for row in configs.itertuples()],
+                             fontsize=9)
+    ax_probe.legend(fontsize=10)
+    ax_probe.grid(True, alpha=0.3, axis='y')
+
+    fig.suptitle('Окупаются ли меньшие коллизии стоимостью пробы', fontsize=16, fontweight='bold')
+    fig.tight_layout()
+    return fig
+
+
+def _select_page_model(df, stats):
+    """Данные графика 8: предсказания модели пробирования и измеренная задержка"""
+    if 'predicted_probes_mean' not in stats.columns:
+        return stats.iloc[:0]
+    columns = GROUP_KEYS + ['predicted_probes_mean', 'median_ns_per_op']
+    return stats.loc[stats['predicted_probes_mean'].notna(), columns]
+
+
+def _render_page_model(model_stats):
+    """График 8: предсказанное число проб против измеренной задержки на операцию"""
+    if model_stats.empty:
+        return None
+
+    fig, (ax_scatter, ax_bars) = plt.subplots(1, 2, figsize=(16, 8))
+    operations = sorted(str(op) for op in model_stats['operation'].unique())
+    markers = dict(zip(operations, ['o', 's', '^', 'v', 'D', 'P']))
+
+    for method in sorted(model_stats['method'].unique()):
+        for operation in operations:
+            subset = model_stats[(model_stats['method'] == method) & (model_stats['operation'] == operation)]
+            if subset.empty:
+                continue
+            ax_scatter.scatter(subset['predicted_probes_mean'], subset['median_ns_per_op'],
+                               color=METHOD_COLORS[method], marker=markers[operation], s=80, alpha=0.8,
+                               label=f"{METHOD_NAMES[method]} ({operation})")
+
+    ax_scatter.set_title('Измеренная задержка от предсказанного числа проб', fontsize=14, fontweight='bold')
+    ax_scatter.set_xlabel('Проб на операцию (модель)', fontsize=12)
+    ax_scatter.set_ylabel('Медиана на операцию (нс)', fontsize=12)
+    ax_scatter.legend(fontsize=8)
+    ax_scatter.grid(True, alpha=0.3)
+
+    # Предсказание (столбцы) и замер (точки на второй оси) для каждой конфигурации
+    configs = model_stats[['operation', 'scenario', 'n']].drop_duplicates().sort_values(['operation', 'scenario', 'n'])
+    methods = sorted(model_stats['method'].unique())
+    x = np.arange(len(configs))
+    width = 0.8 / len(methods)
+    ax_latency = ax_bars.twinx()
+    for i, method in enumerate(methods):
+        values = configs.merge(model_stats[model_stats['method'] == method],
+                               on=['operation', 'scenario', 'n'], how='left')
+        offset = x + (i - (len(methods) - 1) / 2) * width
+        ax_bars.bar(offset, values['predicted_probes_mean'], width, color=METHOD_COLORS[method],
+                    alpha=0.6, label=METHOD_NAMES[method])
+        ax_latency.plot(offset, values['median_ns_per_op'], 'o', color='black', markersize=5)
+
+    ax_bars.set_title('Модель (столбцы) и замер (точки)', fontsize=14, fontweight='bold')
+    ax_bars.set_ylabel('Проб на операцию (модель)', fontsize=12)
+    ax_latency.set_ylabel('Медиана на операцию (нс)', fontsize=12)
+    ax_bars.set_xticks(x)
+    ax_bars.set_xticklabels([f"{row.operation}\n{row.scenario}\nN={row.n}" for row in configs.itertuples()],
+                            fontsize=8)
+    ax_bars.legend(fontsize=10)
+    ax_bars.grid(True, alpha=0.3, axis='y')
+
+    fig.suptitle('Модель пробирования HashTable и измеренная задержка', fontsize=16, fontweight='bold')
+    fig.tight_layout()
+    return fig
+
+
+# Страницы отчёта в порядке следования: ключ, заголовок, выборка данных, отрисовка, сообщение при пустых данных
+REPORT_PAGES = [
+    ('probing_methods', " График 1: Сравнение методов вставки",
+     _select_page_probing_methods, _render_page_probing_methods, "    Нет данных для графика 1"),
+    ('scenarios', " График 2: Сравнение сценариев данных",
+     _select_page_scenarios, _render_page_scenarios, "   ️ Нет данных для графика 2"),
+    ('find_erase', "📈 График 3: Сравнение операций поиска и удаления",
+     _select_page_find_erase, _render_page_find_erase, "   ️ Нет данных для графика 3"),
+    ('stl_insert', "📈 График 4: Сравнение с STL",
+     _select_page_stl_insert, _render_page_stl_insert, "   ⚠ Недостаточно данных для сравнения с STL"),
+    ('insert_medians', " График 5: Средние задержки вставки по методам",
+     _select_page_insert_medians, _render_page_insert_medians, "   ️ Нет данных для bar chart"),
+    ('stl_find', " График 6: Сравнение поиска STL vs кастомная",
+     _select_page_stl_find, _render_page_stl_find, "   ⚠️ Недостаточно данных для сравнения поиска с STL"),
+    ('collisions', " График 7: Коллизии и стоимость пробы",
+     _select_page_collisions, _render_page_collisions,
+     "   ️ Нет счётчиков коллизий (укажите JSON --benchmark_out)"),
+    ('model', " График 8: Модель пробирования и измеренная задержка",
+     _select_page_model, _render_page_model, "   ️ Нет предсказаний модели (укажите --model)"),
+]
+PAGE_RENDERERS = {key: render for key, _, _, render, _ in REPORT_PAGES}
+
+# Колонки, которые передаются в процесс отрисовки страницы
+PAGE_COLUMNS = GROUP_KEYS + ['ns_per_op']
+
+# Версия отрисовки страниц: увеличить при изменении функций _render_page_*
+PAGE_CACHE_VERSION = 6
+
+
+def _render_page_pdf(page_key, data):
+    """Отрисовка страницы в рабочем процессе до готового одностраничного PDF (None - нет данных)"""
+    _import_plotting()
+    fig = PAGE_RENDERERS[page_key](data)
+    if fig is None:
+        return None
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='pdf')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+PDF_OBJECT_RE = re.compile(rb'(\d+) 0 obj\n')
+PDF_REFERENCE_RE = re.compile(rb'(\d+) 0 R\b')
+
+
+def _pdf_objects(document):
+    """Объекты PDF matplotlib по таблице xref: {номер: тело между 'N 0 obj' и 'endobj'}, корень и Info"""
+    xref_offset = int(document[document.rindex(b'startxref') + len(b'startxref'):].split()[0])
+    trailer = document[document.index(b'trailer', xref_offset):]
+    root = int(re.search(rb'/Root (\d+) 0 R', trailer).group(1))
+    info = re.search(rb'/Info (\d+) 0 R', trailer)
+
+    lines = document[xref_offset:].split(b'\n', 2)
+    first, count = map(int, lines[1].split())
+    offsets = {}
+    for i in range(count):
+        entry = lines[2][i * 20:(i + 1) * 20]
+        if entry[17:18] == b'n':
+            offsets[first + i] = int(entry[:10])
+
+    # Объекты записаны подряд: каждый заканчивается там, где начинается следующий (или таблица xref)
+    bounds = sorted(offsets.values()) + [xref_offset]
+    ends = dict(zip(bounds, bounds[1:]))
+    objects = {}
+    for number, offset in offsets.items():
+        chunk = document[offset:ends[offset]]
+        header = PDF_OBJECT_RE.match(chunk)
+        body = chunk[header.end():chunk.rindex(b'endobj')]
+        objects[number] = body
+    return objects, root, int(info.group(1)) if info else None
+
+
+def merge_pdf_pages(documents):
+    """Склейка PDF matplotlib в один документ без повторной отрисовки.
+
+    Объекты каждого документа перенумеровываются, ссылки переписываются только в словарях
+    (сжатые потоки не трогаются), страницы подвешиваются к общему узлу /Pages.
+
+    Рассчитано только на вывод matplotlib (backend_pdf): несжатая таблица xref из одного раздела,
+    объекты подряд без потоков объектов (/ObjStm) и потоков xref (/XRef); другие PDF не поддерживаются.
+    """
+    output = io.BytesIO()
+    output.write(b'%PDF-1.4\n%\xac\xdc \xab\xba\n')
+    offsets = {}
+    kids = []
+    next_number = 3  # 1 - каталог, 2 - дерево страниц
+
+    def write_object(number, body):
+        offsets[number] = output.tell()
+        output.write(b'%d 0 obj\n' % number + body + b'endobj\n')
+
+    for document in documents:
+        objects, root, info = _pdf_objects(document)
+        pages = int(re.search(rb'/Pages (\d+) 0 R', objects[root]).group(1))
+        page_numbers = [int(n) for n in PDF_REFERENCE_RE.findall(
+            re.search(rb'/Kids \[([^\]]*)\]', objects[pages]).group(1))]
+
+        mapping = {pages: 2}
+        for number in sorted(objects):
+            if number not in (root, pages, info):
+                mapping[number] = next_number
+                next_number += 1
+
+        def renumber(match):
+            return b'%d 0 R' % mapping[int(match.group(1))]
+
+        for number in sorted(objects):
+            if number in (root, pages, info):
+                continue
+            body = objects[number]
+            # Ссылки переписываются в словаре объекта, двоичный поток копируется как есть
+            split = body.find(b'stream\n')
+            if split >= 0:
+                body = PDF_REFERENCE_RE.sub(renumber, body[:split]) + body[split:]
+            else:
+                body = PDF_REFERENCE_RE.sub(renumber, body)
+            write_object(mapping[number], body)
+        kids.extend(mapping[number] for number in page_numbers)
+
+    write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>\n')
+    write_object(2, b'<< /Type /Pages /Kids [ ' + b' '.join(b'%d 0 R' % kid for kid in kids) +
+                 b' ] /Count %d >>\n' % len(kids))
+
+    xref_offset = output.tell()
+    output.write(b'xref\n0 %d\n0000000000 65535 f \n' % next_number)
+    for number in range(1, next_number):
+        output.write(b'%010d 00000 n \n' % offsets[number])
+    output.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (next_number, xref_offset))
+    return output.getvalue()
+
+
+def _page_digest(page_key, data):
+    """Хэш содержимого выборки страницы (ключ кэша отрисованных страниц)"""
+    digest = hashlib.sha1()
+    digest.update(f"{page_key}:{PAGE_CACHE_VERSION}:{matplotlib.__version__}".encode('utf-8'))
+    digest.update(",".join(map(str, data.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+@profiled('create_latency_distributions')
+def create_latency_distributions(df, output_pdf="hash_table_performance_analysis.pdf", stats=None, jobs=1,
+                                 page_cache_dir=None):
+    """Создание графиков распределения задержек"""
+    with PROFILER.stage('import_plotting'):
+        _import_plotting()
+
+    print(f"\n Создание графиков в {output_pdf}...")
+
+    if stats is None:
+        stats = compute_group_stats(df)
+
+    # Выборки данных для всех страниц (в основном процессе)
+    page_data = []
+    for key, title, select, _, _ in REPORT_PAGES:
+        print(title)
+        with PROFILER.stage('select_page', page=key) as details:
+            data = select(df, stats)
+            if 'ns_per_op' in data.columns:
+                data = data[PAGE_COLUMNS]
+                print(f"   Данные для графика: {len(data)} записей")
+            details['rows'] = len(data)
+        page_data.append(data)
+
+    # Страницы с неизменившимися данными берутся из кэша
+    page_keys = [key for key, _, _, _, _ in REPORT_PAGES]
+    payloads = [None] * len(REPORT_PAGES)
+    cached = [False] * len(REPORT_PAGES)
+    cache_paths = [None] * len(REPORT_PAGES)
+    if page_cache_dir is not None:
+        page_cache_dir = Path(page_cache_dir)
+        try:
+            page_cache_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"   Не удалось сохранить кэш страниц: {e}")
+            page_cache_dir = None
+    if page_cache_dir is not None:
+        for i, (key, data) in enumerate(zip(page_keys, page_data)):
+            cache_paths[i] = page_cache_dir / f"{key}-{_page_digest(key, data)}.pdf"
+            if cache_paths[i].exists():
+                # Пустой файл - страница без данных: это тоже готовый результат
+                payloads[i] = cache_paths[i].read_bytes() or None
+                cached[i] = True
+
+    todo = [i for i, hit in enumerate(cached) if not hit]
+    if page_cache_dir is not None:
+        print(f" Страниц из кэша: {len(payloads) - len(todo)}, перерисовать: {len(todo)}")
+
+    if jobs is None or jobs <= 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(todo))
+
+    if jobs > 1:
+        # Каждая страница рисуется в своём процессе до готового PDF, родитель только склеивает их
+        print(f" Параллельная отрисовка: {jobs} процессов")
+        with PROFILER.stage('render_pages_parallel', pages=len(todo), jobs=jobs):
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                rendered = list(executor.map(_render_page_pdf,
+                                             [page_keys[i] for i in todo], [page_data[i] for i in todo]))
+    else:
+        rendered = []
+        for i in todo:
+            with PROFILER.stage('render_page', page=page_keys[i]):
+                rendered.append(_render_page_pdf(page_keys[i], page_data[i]))
+
+    for i, payload in zip(todo, rendered):
+        payloads[i] = payload
+        if cache_paths[i] is not None:
+            try:
+                for stale in page_cache_dir.glob(f"{page_keys[i]}-*.pdf"):
+                    stale.unlink()
+                cache_paths[i].write_bytes(payload or b'')
+            except OSError as e:
+                print(f"   Не удалось сохранить кэш для страницы {page_keys[i]}: {e}")
+                cache_paths[i] = None
+
+    pages = []
+    for (_, _, _, _, empty_message), payload in zip(REPORT_PAGES, payloads):
+        if payload is None:
+            print(empty_message)
+            continue
+        pages.append(payload)
+
+    with PROFILER.stage('write_pdf', pages=len(pages)):
+        if pages:
+            Path(output_pdf).write_bytes(merge_pdf_pages(pages))
         else:
-            print("   ⚠️ Недостаточно данных для сравнения поиска с STL")
+            with PdfPages(output_pdf):
+                pass
+
+
+# HTML отчёт: гистограммы групп считаются заранее, в файл попадают только бины и таблица статистик,
+# поэтому размер зависит от числа конфигураций, а не от числа измерений
+HTML_BINS = 50
+HTML_KDE_POINTS = 128
+HTML_SIGNIFICANT_DIGITS = 4
+
+# Усечение хвоста перед построением гистограммы (как на страницах PDF): поиск/удаление - P99, остальное - P95
+HTML_TRIM_PERCENTILES = {'find': 99, 'erase': 99, 'find_existing': 99, 'find_missing': 99}
+HTML_DEFAULT_TRIM = 95
+
+HTML_STAT_COLUMNS = ['count', 'mean_ns_per_op', 'median_ns_per_op', 'p95_ns_per_op', 'max_ns_per_op', 'ops_per_sec',
+                     'collisions_per_key']
+
+# Страницы HTML отчёта (те же сравнения, что страницы 1-6 PDF); methods/scenarios - выбор по умолчанию
+HTML_REPORT_PAGES = [
+    {'key': 'probing_methods', 'tab': 'Методы пробирования', 'kind': 'hist',
+     'title': 'Распределение задержек вставки: сравнение методов пробирования',
+     'operations': ['insert'], 'methods': [0, 1, 2], 'scenarios': ['random']},
+    {'key': 'scenarios', 'tab': 'Распределение ключей', 'kind': 'hist',
+     'title': 'Распределение задержек вставки: влияние распределения ключей',
+     'operations': ['insert'], 'methods': [0], 'scenarios': ['random', 'ascending', 'clustered', 'high_collision']},
+    {'key': 'find_erase', 'tab': 'Поиск и удаление', 'kind': 'hist',
+     'title': 'Сравнение задержек операций поиска и удаления',
+     'operations': ['find', 'erase', 'find_existing', 'find_missing'], 'methods': [2], 'scenarios': ['random']},
+    {'key': 'stl_insert', 'tab': 'Вставка vs STL', 'kind': 'hist',
+     'title': 'Сравнение производительности: кастомная vs STL реализация (вставка)',
+     'operations': ['insert', 'stl_insert'], 'methods': [2, -1], 'scenarios': ['random']},
+    {'key': 'insert_medians', 'tab': 'Медианы вставки', 'kind': 'bar',
+     'title': 'Сравнение медианных задержек вставки по методам',
+     'operations': ['insert'], 'methods': [0, 1, 2], 'scenarios': ['random']},
+    {'key': 'stl_find', 'tab': 'Поиск vs STL', 'kind': 'hist',
+     'title': 'Сравнение производительности поиска: кастомная vs STL',
+     'operations': ['find', 'stl_find'], 'methods': [2, -1], 'scenarios': ['random']}
+]
+
+HTML_REPORT_TEMPLATE = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+body { font-family: sans-serif; margin: 20px; color: #222; }
+nav button { margin: 2px; padding: 6px 10px; border: 1px solid #999; background: #f4f4f4; cursor: pointer; }
+nav button.active { background: steelblue; color: #fff; }
+#controls { display: flex; gap: 16px; flex-wrap: wrap; margin: 12px 0; }
+#controls fieldset { border: 1px solid #ccc; }
+#controls label { margin-right: 10px; white-space: nowrap; }
+table { border-collapse: collapse; margin-top: 12px; font-size: 13px; }
+td, th { border: 1px solid #ccc; padding: 3px 8px; text-align: right; }
+th { background: #eee; }
+td.key { text-align: left; }
+svg text { font-size: 12px; }
+</style>
+</head>
+<body>
+<h1>__TITLE__</h1>
+<p id="meta"></p>
+<nav id="tabs"></nav>
+<div id="controls"></div>
+<h2 id="page-title"></h2>
+<svg id="chart" width="1000" height="520"></svg>
+<p id="empty" hidden>Нет данных для выбранных метода, сценария и N</p>
+<table id="stats"></table>
+<script>
+const DATA = __DATA__;
+const PALETTE = ['steelblue', 'coral', 'green', 'purple', 'orange', 'red', 'blue', 'brown', 'gray', 'olive'];
+const SVG_NS = 'http://www.w3.org/2000/svg';
+const W = 1000, H = 520, M = {l: 70, r: 20, t: 20, b: 50};
+let page = null;
+let state = null;
+
+function groupKey(g) { return [g.operation, g.scenario, g.n, g.method].join('|'); }
+function unique(values) { return [...new Set(values)].sort((a, b) => a < b ? -1 : a > b ? 1 : 0); }
+function methodName(m) { return DATA.method_names[m] || String(m); }
+function scenarioName(s) { return DATA.scenario_names[s] || s; }
+function operationName(o) { return DATA.operation_names[o] || o; }
+function fmt(v, digits) { return v === null || v === undefined ? '—' : Number(v).toFixed(digits); }
+
+function pageGroups(p) { return DATA.stats.filter(g => p.operations.includes(g.operation)); }
+
+function selectPage(index) {
+  page = DATA.pages[index];
+  const ns = unique(pageGroups(page).map(g => g.n));
+  state = {methods: new Set(page.methods), scenarios: new Set(page.scenarios), n: ns.length ? ns[ns.length - 1] : null};
+  document.querySelectorAll('#tabs button').forEach((b, i) => b.classList.toggle('active', i === index));
+  buildControls();
+  render();
+}
+
+function checkboxGroup(title, values, selected, label) {
+  const fieldset = document.createElement('fieldset');
+  fieldset.innerHTML = '<legend>' + title + '</legend>';
+  values.forEach(value => {
+    const item = document.createElement('label');
+    const box = document.createElement('input');
+    box.type = 'checkbox';
+    box.checked = selected.has(value);
+    box.onchange = () => { box.checked ? selected.add(value) : selected.delete(value); render(); };
+    item.append(box, ' ' + label(value));
+    fieldset.appendChild(item);
+  });
+  return fieldset;
+}
+
+function buildControls() {
+  const controls = document.getElementById('controls');
+  const groups = pageGroups(page);
+  controls.replaceChildren(
+    checkboxGroup('Метод', unique(groups.map(g => g.method)), state.methods, methodName),
+    checkboxGroup('Сценарий', unique(groups.map(g => g.scenario)), state.scenarios, scenarioName));
+
+  const fieldset = document.createElement('fieldset');
+  fieldset.innerHTML = '<legend>N</legend>';
+  const select = document.createElement('select');
+  unique(groups.map(g => g.n)).forEach(n => {
+    const option = new Option(String(n), String(n), false, n === state.n);
+    select.add(option);
+  });
+  select.onchange = () => { state.n = Number(select.value); render(); };
+  fieldset.appendChild(select);
+  controls.appendChild(fieldset);
+}
+
+function selectedRows() {
+  return pageGroups(page)
+    .filter(g => state.methods.has(g.method) && state.scenarios.has(g.scenario) && g.n === state.n)
+    .sort((a, b) => page.operations.indexOf(a.operation) - page.operations.indexOf(b.operation) ||
+                    a.method - b.method || (a.scenario < b.scenario ? -1 : a.scenario > b.scenario ? 1 : 0));
+}
+
+function seriesLabels(rows) {
+  const varying = ['operation', 'scenario', 'method'].filter(k => unique(rows.map(r => r[k])).length > 1);
+  const parts = varying.length ? varying : ['method'];
+  const names = {operation: operationName, scenario: scenarioName, method: methodName};
+  return rows.map(r => parts.map(k => names[k](r[k])).join(', '));
+}
+
+function seriesColors(rows) {
+  const onlyMethods = unique(rows.map(r => r.operation)).length === 1 && unique(rows.map(r => r.scenario)).length === 1;
+  return rows.map((r, i) => onlyMethods ? (DATA.method_colors[r.method] || 'gray') : PALETTE[i % PALETTE.length]);
+}
+
+function el(name, attrs, text) {
+  const node = document.createElementNS(SVG_NS, name);
+  Object.entries(attrs).forEach(([k, v]) => node.setAttribute(k, v));
+  if (text !== undefined) node.textContent = text;
+  return node;
+}
+
+function ticks(low, high, count) {
+  const range = high - low || 1;
+  let step = Math.pow(10, Math.floor(Math.log10(range / count)));
+  if (range / step > count * 5) step *= 5; else if (range / step > count * 2) step *= 2;
+  const result = [];
+  for (let v = Math.ceil(low / step) * step; v <= high + step * 1e-9; v += step) result.push(Number(v.toPrecision(6)));
+  return result;
+}
+
+function drawAxes(svg, sx, sy, xTicks, yTicks, xLabel, yLabel) {
+  svg.appendChild(el('line', {x1: M.l, y1: H - M.b, x2: W - M.r, y2: H - M.b, stroke: '#333'}));
+  svg.appendChild(el('line', {x1: M.l, y1: M.t, x2: M.l, y2: H - M.b, stroke: '#333'}));
+  xTicks.forEach(v => {
+    svg.appendChild(el('line', {x1: sx(v), y1: M.t, x2: sx(v), y2: H - M.b, stroke: '#eee'}));
+    svg.appendChild(el('text', {x: sx(v), y: H - M.b + 16, 'text-anchor': 'middle'}, String(v)));
+  });
+  yTicks.forEach(v => {
+    svg.appendChild(el('line', {x1: M.l, y1: sy(v), x2: W - M.r, y2: sy(v), stroke: '#eee'}));
+    svg.appendChild(el('text', {x: M.l - 6, y: sy(v) + 4, 'text-anchor': 'end'}, String(v)));
+  });
+  svg.appendChild(el('text', {x: (M.l + W - M.r) / 2, y: H - 10, 'text-anchor': 'middle'}, xLabel));
+  svg.appendChild(el('text', {x: 16, y: (M.t + H - M.b) / 2, 'text-anchor': 'middle',
+                              transform: 'rotate(-90 16 ' + (M.t + H - M.b) / 2 + ')'}, yLabel));
+}
+
+function drawLegend(svg, labels, colors) {
+  labels.forEach((label, i) => {
+    const y = M.t + 10 + i * 18;
+    svg.appendChild(el('rect', {x: W - M.r - 300, y: y - 10, width: 12, height: 12, fill: colors[i], 'fill-opacity': 0.6}));
+    svg.appendChild(el('text', {x: W - M.r - 282, y: y}, label));
+  });
+}
+
+function drawHistograms(svg, rows, labels, colors) {
+  const dists = rows.map(r => DATA.groups[groupKey(r)]);
+  let x0 = Infinity, x1 = -Infinity, y1 = 0;
+  dists.forEach(d => {
+    x0 = Math.min(x0, d.edges[0], d.kde_x ? d.kde_x[0] : Infinity);
+    x1 = Math.max(x1, d.edges[d.edges.length - 1], d.kde_x ? d.kde_x[d.kde_x.length - 1] : -Infinity);
+    y1 = Math.max(y1, ...d.density, ...(d.kde_y || []));
+  });
+  const sx = v => M.l + (v - x0) / (x1 - x0 || 1) * (W - M.l - M.r);
+  const sy = v => H - M.b - v / (y1 || 1) * (H - M.t - M.b);
+  drawAxes(svg, sx, sy, ticks(x0, x1, 8), ticks(0, y1, 5), 'Время на операцию (наносекунды)', 'Плотность вероятности');
+
+  dists.forEach((d, i) => {
+    let path = 'M' + sx(d.edges[0]) + ',' + sy(0);
+    d.density.forEach((v, j) => { path += 'L' + sx(d.edges[j]) + ',' + sy(v) + 'L' + sx(d.edges[j + 1]) + ',' + sy(v); });
+    path += 'L' + sx(d.edges[d.edges.length - 1]) + ',' + sy(0) + 'Z';
+    svg.appendChild(el('path', {d: path, fill: colors[i], 'fill-opacity': 0.35, stroke: colors[i]}));
+    if (d.kde_x) {
+      const points = d.kde_x.map((x, j) => sx(x) + ',' + sy(d.kde_y[j])).join(' ');
+      svg.appendChild(el('polyline', {points: points, fill: 'none', stroke: colors[i], 'stroke-width': 2}));
+    }
+  });
+  drawLegend(svg, labels.map((label, i) => label + ' (n=' + dists[i].count + ')'), colors);
+}
+
+function drawBars(svg, rows, labels, colors) {
+  const values = rows.map(r => r.median_ns_per_op);
+  const y1 = Math.max(...values) * 1.1;
+  const band = (W - M.l - M.r) / rows.length;
+  const sy = v => H - M.b - v / (y1 || 1) * (H - M.t - M.b);
+  drawAxes(svg, v => v, sy, [], ticks(0, y1, 5), 'Метод пробирования', 'Медианное время на операцию (наносекунды)');
+  rows.forEach((r, i) => {
+    const x = M.l + band * (i + 0.2);
+    svg.appendChild(el('rect', {x: x, y: sy(values[i]), width: band * 0.6, height: H - M.b - sy(values[i]),
+                                fill: colors[i], 'fill-opacity': 0.7}));
+    svg.appendChild(el('text', {x: x + band * 0.3, y: sy(values[i]) - 4, 'text-anchor': 'middle'}, values[i].toFixed(1)));
+    svg.appendChild(el('text', {x: x + band * 0.3, y: H - M.b + 16, 'text-anchor': 'middle'}, labels[i]));
+  });
+}
+
+function renderTable(rows, labels) {
+  const table = document.getElementById('stats');
+  const extra = ['collisions_per_key'].filter(c => rows.some(r => r[c] !== null && r[c] !== undefined));
+  let html = '<tr><th>Серия</th><th>Операция</th><th>Измерений</th><th>Среднее, нс/оп</th><th>Медиана, нс/оп</th>' +
+             '<th>P95, нс/оп</th><th>Макс, нс/оп</th><th>Млн оп/с</th>' + extra.map(c => '<th>' + c + '</th>').join('') + '</tr>';
+  rows.forEach((r, i) => {
+    html += '<tr><td class="key">' + labels[i] + '</td><td class="key">' + operationName(r.operation) + '</td><td>' +
+            r.count + '</td><td>' + fmt(r.mean_ns_per_op, 1) + '</td><td>' + fmt(r.median_ns_per_op, 1) + '</td><td>' +
+            fmt(r.p95_ns_per_op, 1) + '</td><td>' + fmt(r.max_ns_per_op, 1) + '</td><td>' +
+            fmt(r.ops_per_sec == null ? null : r.ops_per_sec / 1e6, 2) + '</td>' +
+            extra.map(c => '<td>' + fmt(r[c], 2) + '</td>').join('') + '</tr>';
+  });
+  table.innerHTML = html;
+}
+
+function render() {
+  const svg = document.getElementById('chart');
+  svg.replaceChildren();
+  const rows = selectedRows().filter(r => page.kind === 'bar' || DATA.groups[groupKey(r)]);
+  document.getElementById('page-title').textContent = page.title + (state.n !== null ? ' (N=' + state.n + ')' : '');
+  document.getElementById('empty').hidden = rows.length > 0;
+  svg.style.display = rows.length ? '' : 'none';
+  const labels = seriesLabels(rows);
+  const colors = seriesColors(rows);
+  if (rows.length) {
+    (page.kind === 'bar' ? drawBars : drawHistograms)(svg, rows, labels, colors);
+  }
+  renderTable(rows, labels);
+}
+
+document.getElementById('meta').textContent = 'Сформирован: ' + DATA.generated_at + ', измерений: ' + DATA.records +
+  ', групп: ' + DATA.stats.length + '. Гистограммы построены заранее по ' + DATA.bins + ' бинам после усечения хвоста (P95, поиск и удаление - P99).';
+DATA.pages.forEach((p, i) => {
+  const button = document.createElement('button');
+  button.textContent = (i + 1) + '. ' + p.tab;
+  button.onclick = () => selectPage(i);
+  document.getElementById('tabs').appendChild(button);
+});
+selectPage(0);
+</script>
+</body>
+</html>
+"""
+
+
+def _round_list(values, digits=HTML_SIGNIFICANT_DIGITS):
+    """Округление до значащих цифр для компактного JSON"""
+    return [float(f"{value:.{digits}g}") for value in np.asarray(values, dtype=np.float64)]
+
+
+def group_distributions(df, bins=HTML_BINS, kde_points=HTML_KDE_POINTS):
+    """Гистограмма и KDE времени на операцию (нс) для каждой группы после усечения хвоста"""
+    groups = {}
+    for (operation, scenario, n, method), values in df.groupby(GROUP_KEYS, observed=True, sort=True)['ns_per_op']:
+        values = values.to_numpy(dtype=np.float64)
+        if len(values) == 0:
+            continue
+        cutoff = np.percentile(values, HTML_TRIM_PERCENTILES.get(operation, HTML_DEFAULT_TRIM))
+        trimmed = values[values <= cutoff]
+
+        dist = binned_distribution(trimmed, bins=bins, grid_size=kde_points)
+        groups['|'.join(map(str, [operation, scenario, int(n), int(method)]))] = {
+            'count': len(trimmed),
+            'edges': _round_list(dist['edges']),
+            'density': _round_list(dist['density']),
+            'kde_x': _round_list(dist['grid']) if dist['kde'] is not None else None,
+            'kde_y': _round_list(dist['kde']) if dist['kde'] is not None else None
+        }
+    return groups
+
+
+def create_html_report(df, output_html="hash_table_performance_analysis.html", stats=None):
+    """Самодостаточный интерактивный HTML отчёт из заранее посчитанных гистограмм и таблицы статистик"""
+    print(f"\n Создание HTML отчёта в {output_html}...")
+    if stats is None:
+        stats = compute_group_stats(df)
+
+    table = stats[[column for column in GROUP_KEYS + HTML_STAT_COLUMNS if column in stats.columns]].copy()
+    for column in ['operation', 'scenario']:
+        table[column] = table[column].astype(str)
+    for column in table.columns:
+        if column not in GROUP_KEYS + ['count']:
+            table[column] = _round_list(table[column])
+
+    data = {
+        'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'records': len(df),
+        'bins': HTML_BINS,
+        'pages': HTML_REPORT_PAGES,
+        'groups': group_distributions(df),
+        'stats': json.loads(table.to_json(orient='records', force_ascii=False)),
+        'method_names': METHOD_NAMES,
+        'method_colors': METHOD_COLORS,
+        'scenario_names': SCENARIO_NAMES,
+        'operation_names': OPERATION_NAMES
+    }
+    # "</" внутри встроенного JSON закрыл бы тег <script>
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    html = (HTML_REPORT_TEMPLATE.replace('__TITLE__', 'Анализ производительности хэш-таблицы')
+            .replace('__DATA__', payload))
+    Path(output_html).write_text(html, encoding='utf-8')
+    print(f" HTML отчёт: {len(data['groups'])} гистограмм, {len(html.encode('utf-8')) / 1024:.0f} КБ")
+
 
+def _stats_label(name, row, several_n):
+    """Подпись строки таблицы статистик"""
+    if several_n:
+        return f"{name}, N={row['n']} (n={int(row['count'])})"
+    return f"{name} (n={int(row['count'])})"
 
-def create_statistical_summary(df):
+
+@profiled('create_statistical_summary')
+def create_statistical_summary(df, stats=None):
     """Создание статистической сводки"""
+    if stats is None:
+        stats = compute_group_stats(df)
+
     print("\n" + "=" * 60)
     print("СТАТИСТИЧЕСКАЯ СВОДКА ПРОИЗВОДИТЕЛЬНОСТИ")
     print("=" * 60)
 
     # Анализ для вставки со случайными данными
-    insert_random = df[(df['operation'] == 'insert') & (df['scenario'] == 'random')]
+    insert_random = select_stats(stats, operation='insert', scenario='random')
+    several_n = insert_random['n'].nunique() > 1
 
-    print(f"\n📊 ОБЩИЙ АНАЛИЗ ВСТАВКИ (случайные данные, N=1024):")
-    print(f"Всего измерений: {len(insert_random)}")
+    print(f"\n📊 ОБЩИЙ АНАЛИЗ ВСТАВКИ (случайные данные, {n_label(insert_random)}):")
+    print(f"Всего измерений: {int(insert_random['count'].sum())}")
 
-    for method in [0, 1, 2]:
-        method_data = insert_random[insert_random['method'] == method]
-        if len(method_data) > 0:
-            latencies = method_data['latency_us']
-            print(f"\n{METHOD_NAMES[method]} (n={len(latencies)}):")
-            print(f"   Медиана: {latencies.median():.2f} мкс")
-            print(f"   Среднее: {latencies.mean():.2f} мкс")
-            print(f"   STD:     {latencies.std():.2f} мкс")
-            print(f"   P95:     {np.percentile(latencies, 95):.2f} мкс")
-            print(f"   Min:     {latencies.min():.2f} мкс")
-            print(f"   Max:     {latencies.max():.2f} мкс")
+    for _, row in insert_random[insert_random['method'].isin([0, 1, 2])].iterrows():
+        print(f"\n{_stats_label(METHOD_NAMES[row['method']], row, several_n)}:")
+        print(f"   Медиана: {row['median_ns_per_op']:.1f} нс/оп ({row['ops_per_sec'] / 1e6:.2f} млн оп/с)")
+        print(f"   Среднее: {row['mean_ns_per_op']:.1f} нс/оп")
+        print(f"   STD:     {row['std_ns_per_op']:.1f} нс/оп")
+        print(f"   P95:     {row['p95_ns_per_op']:.1f} нс/оп")
+        print(f"   Min:     {row['min_ns_per_op']:.1f} нс/оп")
+        print(f"   Max:     {row['max_ns_per_op']:.1f} нс/оп")
 
     # Анализ операций поиска и удаления
     print(f"\n АНАЛИЗ ОПЕРАЦИЙ ПОИСКА И УДАЛЕНИЯ (Quadratic Probing):")
-    quadratic_data = df[(df['scenario'] == 'random') & (df['method'] == 2)]
+    quadratic_stats = select_stats(stats, scenario='random', method=2)
+    several_n = quadratic_stats['n'].nunique() > 1
 
     for op, op_name in [('find', 'Поиск'), ('erase', 'Удаление'),
                         ('find_existing', 'Поиск (существ.)'),
                         ('find_missing', 'Поиск (отсутств.)')]:
-        op_data = quadratic_data[quadratic_data['operation'] == op]
-        if len(op_data) > 0:
-            latencies = op_data['latency_us']
-            print(f"\n{op_name} (n={len(latencies)}):")
-            print(f"   Медиана: {latencies.median():.3f} мкс")
-            print(f"   Среднее: {latencies.mean():.3f} мкс")
-            print(f"   STD:     {latencies.std():.3f} мкс")
-            print(f"   P95:     {np.percentile(latencies, 95):.3f} мкс")
-
-    # Сравнение с STL
+        for _, row in quadratic_stats[quadratic_stats['operation'] == op].iterrows():
+            print(f"\n{_stats_label(op_name, row, several_n)}:")
+            print(f"   Медиана: {row['median_ns_per_op']:.1f} нс/оп ({row['ops_per_sec'] / 1e6:.2f} млн оп/с)")
+            print(f"   Среднее: {row['mean_ns_per_op']:.1f} нс/оп")
+            print(f"   STD:     {row['std_ns_per_op']:.1f} нс/оп")
+            print(f"   P95:     {row['p95_ns_per_op']:.1f} нс/оп")
+
+    # Сравнение с STL (одинаковые сценарий и N, время одной операции)
     print(f"\n СРАВНЕНИЕ С STL:")
-    stl_insert = df[df['operation'] == 'stl_insert']
-    custom_insert = df[(df['operation'] == 'insert') & (df['method'] == 2)]
+    for stl_op, custom_op, op_name in [('stl_insert', 'insert', 'Вставка'), ('stl_find', 'find', 'Поиск')]:
+        stl_rows = select_stats(stats, operation=stl_op, scenario='random')
+        custom_rows = select_stats(stats, operation=custom_op, scenario='random', method=2)
+        pairs = stl_rows.merge(custom_rows, on='n', suffixes=('_stl', '_custom'))
+
+        for _, row in pairs.iterrows():
+            stl_median = row['median_ns_per_op_stl']
+            custom_median = row['median_ns_per_op_custom']
+            ratio = custom_median / stl_median if stl_median > 0 else float('inf')
+
+            if len(pairs) > 1:
+                print(f"  N={row['n']}:")
+            print(f"  STL {op_name}: {stl_median:.1f} нс/оп ({row['ops_per_sec_stl'] / 1e6:.2f} млн оп/с)")
+            print(f"  Кастомная {op_name}: {custom_median:.1f} нс/оп ({row['ops_per_sec_custom'] / 1e6:.2f} млн оп/с)")
+            print(f"  Отношение: {ratio:.2f}x")
+
+
+def print_counter_summary(joined, correlations):
+    """Сводка по счётчикам: коллизии, коэффициент заполнения и стоимость пробы по методам"""
+    measured = joined[joined['collisions'].notna()].sort_values(GROUP_KEYS)
+    if measured.empty:
+        return
+
+    print("\n" + "=" * 60)
+    print("КОЛЛИЗИИ И ЗАДЕРЖКА (счётчики Google Benchmark)")
+    print("=" * 60)
+    print(f"{'operation':<10}{'scenario':<16}{'n':>8}  {'method':<18}{'колл./ключ':>11}"
+          f"{'LF':>7}{'нс/оп':>9}{'нс/пробу':>10}")
+    for _, row in measured.iterrows():
+        print(f"{row['operation']:<10}{row['scenario']:<16}{row['n']:>8}  {METHOD_NAMES[row['method']]:<18}"
+              f"{row['collisions_per_key']:>11.3f}{row['load_factor']:>7.3f}"
+              f"{row['median_ns_per_op']:>9.1f}{row['ns_per_probe']:>10.1f}")
+
+    print("\n Связь коллизий и задержки по методам (между сценариями и N):")
+    for _, row in correlations.iterrows():
+        line = f"  {row['operation']}, {METHOD_NAMES[row['method']]} ({int(row['configs'])} конфиг.): "
+        if not np.isnan(row['pearson_r']):
+            line += f"r = {row['pearson_r']:.2f}, "
+        if not np.isnan(row['slope_ns_per_collision']):
+            line += f"{row['slope_ns_per_collision']:+.1f} нс/оп на коллизию/ключ, "
+        print(line + f"{row['ns_per_probe']:.1f} нс/пробу")
+
+
+@profiled('attach_benchmark_counters')
+def attach_benchmark_counters(stats, json_files):
+    """Счётчики из JSON бенчмарков в таблице статистик (stats без изменений, если файлов нет)"""
+    if not json_files:
+        return stats
+
+    joined = join_benchmark_counters(stats, load_benchmark_counters(json_files))
+    print_counter_summary(joined, counter_correlations(joined))
+    return joined
+
+
+@profiled('attach_model_predictions')
+def attach_model_predictions(stats):
+    """Предсказания модели пробирования (hash_table_model) для конфигураций таблицы статистик"""
+    import hash_table_model
+
+    candidates = stats[stats['operation'].isin(hash_table_model.MODEL_OPERATIONS) &
+                       stats['scenario'].isin(hash_table_model.SCENARIOS) & stats['method'].isin([0, 1, 2])]
+    configs = set(zip(candidates['scenario'].astype(str), candidates['n'], candidates['method']))
+    if not configs:
+        return stats
+
+    print(f"\n Моделирование пробирования: {len(configs)} конфигураций")
+    predictions = hash_table_model.predict_probes(configs)
+    for column in GROUP_KEYS:
+        predictions[column] = predictions[column].astype(stats[column].dtype)
+
+    joined = stats.merge(predictions, on=GROUP_KEYS, how='left')
+    print_model_summary(joined)
+    return joined
+
+
+def print_model_summary(joined):
+    """Предсказанное число проб рядом с измеренной задержкой (и измеренными коллизиями, если есть)"""
+    modelled = joined[joined['predicted_probes_mean'].notna()].sort_values(GROUP_KEYS)
+    has_counters = 'collisions' in modelled.columns
+
+    print("\n" + "=" * 60)
+    print("МОДЕЛЬ ПРОБИРОВАНИЯ И ИЗМЕРЕННАЯ ЗАДЕРЖКА")
+    print("=" * 60)
+    print(f"{'operation':<14}{'scenario':<16}{'n':>8}  {'method':<18}{'проб/оп':>9}{'P99':>6}"
+          f"{'нс/оп':>9}{'колл. модель':>14}" + (f"{'колл. замер':>13}" if has_counters else ""))
+    for _, row in modelled.iterrows():
+        line = (f"{row['operation']:<14}{row['scenario']:<16}{row['n']:>8}  {METHOD_NAMES[row['method']]:<18}"
+                f"{row['predicted_probes_mean']:>9.3f}{row['predicted_probes_p99']:>6.0f}"
+                f"{row['median_ns_per_op']:>9.1f}")
+        for column, width in [('predicted_collisions', 14)] + ([('collisions', 13)] if has_counters else []):
+            line += f"{row[column]:>{width}.0f}" if not np.isnan(row[column]) else f"{'-':>{width}}"
+        print(line)
+
+
+@profiled('run_streaming_summary')
+def run_streaming_summary(csv_directory, args):
+    """Потоковая сводка: скетчи по группам вместо загрузки всех измерений"""
+    csv_files = sorted(latency_files(csv_directory))
+    if not csv_files:
+        directories = ', '.join(map(str, data_directories(csv_directory)))
+        raise FileNotFoundError(f"CSV файлы не найдены в директории {directories}")
+
+    print(f" Потоковая обработка {len(csv_files)} файлов (кусок: {args.chunksize} строк)")
+    sketches = stream_group_sketches(csv_files, args.chunksize, args.jobs, args.relative_error)
+    stats = sketch_group_stats(sketches)
+
+    print_quantile_table(stats)
+    create_statistical_summary(None, stats=stats)
+    stats = attach_benchmark_counters(stats, _benchmark_json(args, csv_directory))
+    if args.model:
+        stats = attach_model_predictions(stats)
+    if args.stats_out:
+        export_group_stats(stats, args.stats_out)
+
 
-    if len(stl_insert) > 0 and len(custom_insert) > 0:
-        stl_median = stl_insert['latency_us'].median()
-        custom_median = custom_insert['latency_us'].median()
-        ratio = custom_median / stl_median if stl_median > 0 else float('inf')
+# Режим наблюдения: максимальный размер блока, читаемого из файла за один раз
+WATCH_READ_BYTES = 64 * 1024 * 1024
 
-        print(f"  STL Вставка:     {stl_median:.2f} мкс")
-        print(f"  Кастомная Вставка: {custom_median:.2f} мкс")
-        print(f"  Отношение: {ratio:.2f}x")
 
-    stl_find = df[df['operation'] == 'stl_find']
-    custom_find = df[(df['operation'] == 'find') & (df['method'] == 2)]
+class LatencyFileTail:
+    """Инкрементальное чтение дописываемого файла задержек.
 
-    if len(stl_find) > 0 and len(custom_find) > 0:
-        stl_median = stl_find['latency_us'].median()
-        custom_median = custom_find['latency_us'].median()
-        ratio = custom_median / stl_median if stl_median > 0 else float('inf')
+    Хранит смещение после последней целиком разобранной строки (или записи .lat)
+    и скетчи по группам только для этого файла. Если файл стал короче смещения
+    (бенчмарк перезапущен и пересоздал его), состояние сбрасывается.
+    """
 
-        print(f"  STL Поиск:       {stl_median:.3f} мкс")
-        print(f"  Кастомная Поиск: {custom_median:.3f} мкс")
-        print(f"  Отношение: {ratio:.2f}x")
+    def __init__(self, file, relative_error=0.01):
+        self.file = file
+        self.relative_error = relative_error
+        self.reset()
 
+    def reset(self):
+        self.offset = 0
+        self.columns = None
+        self.sketches = {}
+        self.rows = 0
 
-def main():
-    """Основная функция"""
+    def poll(self):
+        """Разбор данных, дописанных с прошлого вызова; возвращает число новых измерений"""
+        try:
+            size = self.file.stat().st_size
+        except FileNotFoundError:
+            self.reset()
+            return 0
+
+        if size < self.offset:
+            print(f" Файл {self.file.name} был перезаписан, начинаю заново")
+            self.reset()
+
+        rows_before = self.rows
+        block_size = WATCH_READ_BYTES
+        with open(self.file, 'rb') as f:
+            while self.offset < size:
+                f.seek(self.offset)
+                data = f.read(min(size - self.offset, block_size))
+                if self.file.suffix == LATENCY_BIN_SUFFIX:
+                    consumed = self._fold_bin(data)
+                else:
+                    consumed = self._fold_csv(data)
+
+                if consumed == 0:
+                    # Незавершённая строка/запись: ждём, пока бенчмарк её допишет
+                    if len(data) < size - self.offset:
+                        block_size *= 2
+                        continue
+                    break
+                self.offset += consumed
+
+        return self.rows - rows_before
+
+    def _fold_csv(self, data):
+        """Разбор целых строк CSV из блока, возвращает число использованных байт"""
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return 0
+
+        body = data[:end]
+        if self.columns is None:
+            header_end = body.index(b'\n') + 1
+            self.columns = body[:header_end].decode('utf-8-sig').strip().split(',')
+            body = body[header_end:]
+            if not set(CSV_DTYPES).issubset(self.columns):
+                print(f"    Пропущен {self.file.name}: нет нужных колонок")
+
+        if not body.strip() or not set(CSV_DTYPES).issubset(self.columns):
+            return end
+
+        chunk = _read_csv_tolerant(io.BytesIO(body), CSV_DTYPES, header=None,
+                                   names=self.columns, usecols=list(CSV_DTYPES))
+
+        _fold_chunk_sketches(self.sketches, chunk, self.relative_error)
+        self.rows += len(chunk)
+        return end
+
+    def _fold_bin(self, data):
+        """Разбор целых записей бинарного формата из блока"""
+        consumed = 0
+        for offset, (operation, scenario, n, method, latencies) in _iter_latency_buffer(
+                data, self.file.name, partial=True):
+            key = (operation, scenario, n, method)
+            if key not in self.sketches:
+                self.sketches[key] = LatencySketch(self.relative_error)
+            self.sketches[key].add(latencies)
+            self.rows += len(latencies)
+            consumed = offset
+        return consumed
+
+
+def watch_directory(csv_directory, interval=5.0, relative_error=0.01, stats_out=None, max_updates=0):
+    """Наблюдение за дописываемыми файлами задержек с периодическим обновлением сводки"""
+    tails = {}
+    updates = 0
+    stats = sketch_group_stats({})
+    try:
+        while True:
+            # Новые файлы могут появиться в ходе прогона
+            for file in sorted(latency_files(csv_directory)):
+                if file not in tails:
+                    tails[file] = LatencyFileTail(file, relative_error)
+            new_rows = sum(tail.poll() for tail in tails.values())
+
+            merged = {}
+            for tail in tails.values():
+                for key, sketch in tail.sketches.items():
+                    merged.setdefault(key, LatencySketch(relative_error)).merge(sketch)
+            stats = sketch_group_stats(merged)
+
+            if sys.stdout.isatty():
+                print("\033[H\033[J", end="")
+            print(f" Наблюдение за {csv_directory} ({time.strftime('%H:%M:%S')}, обновление каждые {interval:g} с)")
+            print(f" Файлов: {len(tails)}, измерений: {sum(t.rows for t in tails.values())}, новых: {new_rows}")
+            print_quantile_table(stats)
+            if stats_out:
+                export_group_stats(stats, stats_out)
+
+            updates += 1
+            if max_updates and updates >= max_updates:
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n Наблюдение остановлено")
+
+    return stats
+
+
+# Сравнение запусков: ограничение на размер матрицы бутстрэп-выборок (элементов)
+BOOTSTRAP_MAX_ELEMENTS = 20_000_000
+
+
+def _bootstrap_statistics(values, n_boot, rng):
+    """Бутстрэп-распределения медианы и P95 (векторно, пачками повторов)"""
+    values = np.asarray(values, dtype=np.float64)
+    batch = max(1, BOOTSTRAP_MAX_ELEMENTS // len(values))
+    medians = np.empty(n_boot)
+    p95s = np.empty(n_boot)
+    for start in range(0, n_boot, batch):
+        stop = min(n_boot, start + batch)
+        samples = values[rng.integers(0, len(values), size=(stop - start, len(values)))]
+        medians[start:stop], p95s[start:stop] = np.percentile(samples, [50, 95], axis=1)
+    return medians, p95s
+
+
+@profiled('compare_runs')
+def compare_runs(baseline_df, candidate_df, n_boot=1000, confidence=0.95, threshold=0.05, seed=0):
+    """Сравнение двух запусков по группам (operation, scenario, n, method).
+
+    Для медианы и P95 считается относительное изменение кандидата к базовому запуску
+    и его бутстрэп-доверительный интервал. Регрессия - нижняя граница интервала выше threshold,
+    улучшение - верхняя граница ниже -threshold.
+    """
+    rng = np.random.default_rng(seed)
+    alpha = (1.0 - confidence) / 2.0
+    baseline_groups = baseline_df.groupby(GROUP_KEYS, observed=True, sort=True)['latency_ns']
+    candidate_groups = dict(list(candidate_df.groupby(GROUP_KEYS, observed=True, sort=True)['latency_ns']))
+
+    rows = []
+    for key, baseline_values in baseline_groups:
+        if key not in candidate_groups:
+            continue
+        baseline_values = baseline_values.to_numpy(dtype=np.float64)
+        candidate_values = candidate_groups[key].to_numpy(dtype=np.float64)
+
+        base_median, base_p95 = _bootstrap_statistics(baseline_values, n_boot, rng)
+        cand_median, cand_p95 = _bootstrap_statistics(candidate_values, n_boot, rng)
+
+        row = dict(zip(GROUP_KEYS, key))
+        row['baseline_count'] = len(baseline_values)
+        row['candidate_count'] = len(candidate_values)
+        for stat, q, base_boot, cand_boot in [('median', 50, base_median, cand_median),
+                                              ('p95', 95, base_p95, cand_p95)]:
+            base_value = np.percentile(baseline_values, q)
+            cand_value = np.percentile(candidate_values, q)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                deltas = cand_boot / base_boot - 1.0
+                row[f'baseline_{stat}_ns'] = base_value
+                row[f'candidate_{stat}_ns'] = cand_value
+                row[f'{stat}_delta'] = cand_value / base_value - 1.0
+            row[f'{stat}_ci_low'], row[f'{stat}_ci_high'] = np.nanquantile(deltas, [alpha, 1.0 - alpha])
+        rows.append(row)
+
+    result = pd.DataFrame(rows)
+    if result.empty:
+        return result
+
+    regression = (result['median_ci_low'] > threshold) | (result['p95_ci_low'] > threshold)
+    improvement = (result['median_ci_high'] < -threshold) | (result['p95_ci_high'] < -threshold)
+    result['verdict'] = np.where(regression, 'regression', np.where(improvement, 'improvement', 'same'))
+    return result
+
+
+def print_comparison(comparison, confidence):
+    """Таблица сравнения запусков"""
+    print("\n" + "=" * 60)
+    print(f"СРАВНЕНИЕ ЗАПУСКОВ (ДИ {confidence:.0%}, изменение кандидата к базовому)")
+    print("=" * 60)
+    print(f"{'operation':<14}{'scenario':<16}{'n':>9}{'method':>7}"
+          f"{'median':>10}{'ДИ медианы':>22}{'P95':>10}{'ДИ P95':>22}  итог")
+    for _, row in comparison.iterrows():
+        print(f"{row['operation']:<14}{row['scenario']:<16}{row['n']:>9}{row['method']:>7}"
+              f"{row['median_delta']:>+10.1%}"
+              f"{f'[{row.median_ci_low:+.1%}; {row.median_ci_high:+.1%}]':>22}"
+              f"{row['p95_delta']:>+10.1%}"
+              f"{f'[{row.p95_ci_low:+.1%}; {row.p95_ci_high:+.1%}]':>22}  {row['verdict']}")
+
+
+def run_comparison(baseline_directory, candidate_directory, args):
+    """Режим сравнения: код возврата 1 при значимой регрессии"""
+    # Сравниваемые запуски в хранилище не записываются: _load_options задаёт только параметры загрузки
+    load_options = _load_options(args)
+    print(f" Базовый запуск: {baseline_directory}")
+    baseline_df = load_and_prepare_data(baseline_directory, **load_options)
+    print(f"\n Кандидат: {candidate_directory}")
+    candidate_df = load_and_prepare_data(candidate_directory, **load_options)
+
+    comparison = compare_runs(baseline_df, candidate_df, n_boot=args.bootstrap,
+                              confidence=args.confidence, threshold=args.regression_threshold)
+    if comparison.empty:
+        print(" Нет общих групп для сравнения")
+        return 0
+
+    print_comparison(comparison, args.confidence)
+    if args.stats_out:
+        export_group_stats(comparison, args.stats_out)
+
+    regressions = comparison[comparison['verdict'] == 'regression']
+    if len(regressions) > 0:
+        print(f"\n❌ Значимые регрессии (> {args.regression_threshold:.0%}): {len(regressions)} групп")
+        return 1
+
+    print(f"\n Значимых регрессий не обнаружено")
+    return 0
+
+
+# Панели отчёта масштабирования: операция кастомной таблицы и её аналог в STL
+SCALING_PANELS = [
+    ('insert', 'stl_insert'),
+    ('find', 'stl_find'),
+    ('find_existing', None),
+    ('find_missing', None),
+    ('erase', None),
+    ('upsert', None)
+]
+
+
+def compute_scaling_table(stats, cliff_threshold=0.25):
+    """Пропускная способность по N для каждой серии (operation, scenario, method).
+
+    ns/op и ops/sec берутся из метрик группы (по медиане); "обрыв" - точка, где пропускная
+    способность упала больше чем на cliff_threshold относительно предыдущего N.
+    """
+    scaling = stats[GROUP_KEYS + ['count', 'median_ns', 'median_ns_per_op', 'ops_per_sec']].copy()
+    scaling = scaling.rename(columns={'median_ns_per_op': 'ns_per_op'})
+    for column in ['operation', 'scenario']:
+        scaling[column] = scaling[column].astype(str)
+
+    scaling = scaling.sort_values(['operation', 'scenario', 'method', 'n']).reset_index(drop=True)
+    previous = scaling.groupby(['operation', 'scenario', 'method'])['ops_per_sec'].shift(1)
+    scaling['throughput_drop'] = 1.0 - scaling['ops_per_sec'] / previous
+    scaling['cliff'] = scaling['throughput_drop'] > cliff_threshold
+    return scaling
+
+
+def fit_scaling(scaling):
+    """Степенная аппроксимация ns/op = a·N^b для каждой серии (МНК в log-log)"""
+    rows = []
+    for (operation, scenario, method), series in scaling.groupby(['operation', 'scenario', 'method']):
+        if series['n'].nunique() < 2:
+            continue
+        exponent, log_coef = np.polyfit(np.log(series['n'].to_numpy(dtype=np.float64)),
+                                        np.log(series['ns_per_op'].to_numpy()), 1)
+        rows.append({'operation': operation, 'scenario': scenario, 'method': method,
+                     'coefficient': float(np.exp(log_coef)), 'exponent': float(exponent),
+                     'n_min': int(series['n'].min()), 'n_max': int(series['n'].max())})
+    return pd.DataFrame(rows, columns=['operation', 'scenario', 'method', 'coefficient', 'exponent',
+                                       'n_min', 'n_max'])
+
+
+def print_scaling_summary(scaling, fits, cliff_threshold):
+    """Текстовая сводка масштабирования"""
+    print("\n" + "=" * 60)
+    print("МАСШТАБИРОВАНИЕ ПО N")
+    print("=" * 60)
+
+    for _, fit in fits.iterrows():
+        print(f"  {fit['operation']:<14}{fit['scenario']:<16}{METHOD_NAMES.get(fit['method'], 'Unknown'):<20}"
+              f" ns/op ≈ {fit['coefficient']:.3g}·N^{fit['exponent']:.3f}"
+              f"  (N={fit['n_min']}…{fit['n_max']})")
+
+    cliffs = scaling[scaling['cliff']]
+    print(f"\n Падения пропускной способности > {cliff_threshold:.0%}:")
+    if cliffs.empty:
+        print("   не обнаружены")
+    for _, row in cliffs.iterrows():
+        print(f"   {row['operation']}/{row['scenario']}/{METHOD_NAMES.get(row['method'], 'Unknown')}: "
+              f"N={row['n']}, -{row['throughput_drop']:.0%} ({row['ops_per_sec']:.3g} ops/s)")
+
+
+@profiled('create_scaling_report')
+def create_scaling_report(scaling, fits, output_pdf="hash_table_scaling.pdf", scenario='random'):
+    """Графики ops/sec и ns/op от N по методам пробирования и STL"""
+    _import_plotting()
+    print(f"\n Создание графиков масштабирования в {output_pdf}...")
+    fit_lookup = {(row['operation'], row['scenario'], row['method']): row for _, row in fits.iterrows()}
+
+    with PdfPages(output_pdf) as pdf:
+        for operation, stl_operation in SCALING_PANELS:
+            panel = scaling[(scaling['scenario'] == scenario) &
+                            scaling['operation'].isin([operation, stl_operation])]
+            if panel['n'].nunique() < 2:
+                continue
+
+            fig, (ax_ops, ax_ns) = plt.subplots(1, 2, figsize=(16, 8))
+            for (series_op, method), series in panel.groupby(['operation', 'method']):
+                color = METHOD_COLORS.get(method, 'gray')
+                label = METHOD_NAMES.get(method, 'Unknown')
+                ax_ops.plot(series['n'], series['ops_per_sec'], marker='o', color=color, label=label)
+                ax_ns.plot(series['n'], series['ns_per_op'], marker='o', color=color, label=label)
+
+                cliffs = series[series['cliff']]
+                ax_ops.scatter(cliffs['n'], cliffs['ops_per_sec'], s=200, facecolors='none',
+                               edgecolors='red', linewidths=2, zorder=5)
+
+                fit = fit_lookup.get((series_op, scenario, method))
+                if fit is not None:
+                    grid = np.geomspace(series['n'].min(), series['n'].max(), 50)
+                    ax_ns.plot(grid, fit['coefficient'] * grid ** fit['exponent'], linestyle='--',
+                               color=color, alpha=0.6, label=f"{label}: ∝ N^{fit['exponent']:.2f}")
+
+            for ax, ylabel in [(ax_ops, 'Операций в секунду'), (ax_ns, 'Наносекунд на операцию')]:
+                ax.set_xscale('log', base=2)
+                ax.set_yscale('log')
+                ax.set_xlabel('Число ключей N', fontsize=14)
+                ax.set_ylabel(ylabel, fontsize=14)
+                ax.grid(True, alpha=0.3, which='both')
+                ax.legend(fontsize=10)
+
+            fig.suptitle(f"Масштабирование: {OPERATION_NAMES.get(operation, operation)} "
+                         f"({SCENARIO_NAMES.get(scenario, scenario)})\n"
+                         f"красные кольца - падение пропускной способности",
+                         fontsize=16, fontweight='bold')
+            fig.tight_layout()
+            pdf.savefig(fig)
+            plt.close(fig)
+
+
+def run_scaling_analysis(df, args, output_pdf, stats=None):
+    """Режим масштабирования: таблица, аппроксимации и графики по N"""
+    if stats is None:
+        stats = compute_group_stats(df)
+    scaling = compute_scaling_table(stats, args.cliff_threshold)
+    fits = fit_scaling(scaling)
+
+    print_scaling_summary(scaling, fits, args.cliff_threshold)
+    create_scaling_report(scaling, fits, output_pdf)
+    if args.stats_out:
+        export_group_stats(scaling, args.stats_out)
+
+
+def _load_options(args):
+    """Параметры load_and_prepare_data из аргументов командной строки"""
+    return dict(use_cache=not args.no_cache, jobs=args.jobs,
+                outlier_method=args.outlier_filter, outlier_threshold=args.outlier_threshold)
+
+
+def _store_run(args, df, stats):
+    """Запись запуска в хранилище результатов по уже посчитанным статистикам групп"""
+    if args.no_store:
+        return None
+    try:
+        return record_run(args.results_db, latency_files(args.csv_directory), stats, len(df),
+                          args.outlier_filter, args.outlier_threshold, args.run_label)
+    except sqlite3.Error as e:
+        print(f"   Не удалось записать запуск в хранилище {args.results_db}: {e}")
+        return None
+
+
+def _benchmark_json(args, csv_directory):
+    """JSON файлы Google Benchmark: явно указанные или найденные в директории с данными"""
+    if args.benchmark_json:
+        return [Path(file) for file in args.benchmark_json]
+    return benchmark_json_files(csv_directory)
+
+
+def _print_dataset_overview(df):
+    """Краткое описание загруженных данных"""
+    print(f"\n Данные успешно загружены и обработаны!")
+    print(f" Всего записей после фильтрации: {len(df)}")
+    print(f" Операции: {list(df['operation'].unique())}")
+    print(f" Сценарии: {list(df['scenario'].unique())}")
+    print(f" Методы: {list(df['method_name'].unique())}")
+    print(f" Размеры N: {sorted(int(n) for n in df['n'].unique())}")
+
+
+def command_summary(args):
+    """Подкоманда summary: только текстовая сводка, без matplotlib/seaborn"""
+    if args.streaming:
+        run_streaming_summary(args.csv_directory, args)
+        return 0
+
+    print("Загрузка данных...")
+    df = load_and_prepare_data(args.csv_directory, **_load_options(args))
+    _print_dataset_overview(df)
+
+    stats = compute_group_stats(df)
+    _store_run(args, df, stats)
+    create_statistical_summary(df, stats=stats)
+    stats = attach_benchmark_counters(stats, _benchmark_json(args, args.csv_directory))
+    if args.model:
+        stats = attach_model_predictions(stats)
+    if args.stats_out:
+        export_group_stats(stats, args.stats_out)
+    return 0
+
+
+def command_plot(args):
+    """Подкоманда plot: PDF отчёт (распределения или масштабирование) и сводка"""
+    print("Загрузка данных...")
+    df = load_and_prepare_data(args.csv_directory, **_load_options(args))
+    _print_dataset_overview(df)
+
+    stats = compute_group_stats(df)
+    _store_run(args, df, stats)
+
+    if args.scaling:
+        run_scaling_analysis(df, args, args.output or "hash_table_scaling.pdf", stats=stats)
+        return 0
+
+    # Создаём графики
+    html = args.html or (args.output or '').lower().endswith('.html')
+    output_file = args.output or ("hash_table_performance_analysis.html" if html
+                                  else "hash_table_performance_analysis.pdf")
+    print(f"\n Создание графиков...")
+    stats = attach_benchmark_counters(stats, _benchmark_json(args, args.csv_directory))
+    if args.model:
+        stats = attach_model_predictions(stats)
+    if html:
+        create_html_report(df, output_file, stats=stats)
+    else:
+        page_cache_dir = None if args.no_cache else data_directories(args.csv_directory)[0] / CACHE_DIR_NAME / "pages"
+        create_latency_distributions(df, output_file, stats=stats, jobs=args.jobs,
+                                     page_cache_dir=page_cache_dir)
+
+    # Создаём статистическую сводку
+    create_statistical_summary(df, stats=stats)
+    if args.stats_out:
+        export_group_stats(stats, args.stats_out)
+
+    result_path = Path(output_file)
+    print(f"\n Анализ завершён!")
+    print(f" Отчёт сохранён: {result_path.absolute()}")
+    if html:
+        print(f"\n HTML отчёт: страницы 1-6 с переключением метода, сценария и N")
+        return 0
+    print(f"\n Создано до 8 ключевых графиков:")
+    print("  1.  Сравнение методов пробирования (вставка)")
+    print("  2.  Влияние распределения ключей")
+    print("  3.  Сравнение операций поиска и удаления")
+    print("  4.  Сравнение с STL (вставка)")
+    print("  5.  Bar chart средних задержек вставки")
+    print("  6.  Сравнение поиска с STL")
+    print("  7.  Коллизии и стоимость пробы (при наличии JSON бенчмарков)")
+    print("  8.  Модель пробирования и измеренная задержка (--model)")
+    return 0
+
+
+def command_watch(args):
+    """Подкоманда watch: живая сводка по файлам, которые бенчмарк ещё дописывает"""
+    watch_directory(args.csv_directory, args.interval, args.relative_error,
+                    args.stats_out, args.max_updates)
+    return 0
+
+
+def command_compare(args):
+    """Подкоманда compare: код возврата 1 при значимой регрессии"""
+    return run_comparison(args.baseline, args.candidate, args)
+
+
+def command_history(args):
+    """Подкоманда history: тренды статистик по запускам из хранилища результатов"""
+    if not os.path.exists(args.results_db):
+        raise FileNotFoundError(f"Хранилище результатов не найдено: {args.results_db}")
+
+    if args.runs:
+        runs = query_runs(args.results_db, args.last)
+        for _, row in runs.iterrows():
+            print(f"  run {row['run_id']:>4}  {row['data_time']}  {_run_label(row):<20}"
+                  f"файлов: {row['files']:>3}  записей: {row['records']:>10}  {row['outlier_filter']}")
+        return 0
+
+    methods = [METHOD_CODES[name] for name in args.method] if args.method else None
+    trend = query_trend(args.results_db, args.metric, args.last, operation=args.operation,
+                        scenario=args.scenario, n=args.n, method=methods)
+    if trend.empty:
+        print(" Нет записей под заданные условия")
+        return 0
+
+    print_trend_summary(trend, args.metric)
+    if args.output:
+        create_trend_report(trend, args.metric, args.output)
+        print(f" Отчёт сохранён: {Path(args.output).absolute()}")
+    if args.stats_out:
+        trend.to_csv(args.stats_out, index=False)
+        print(f" Таблица истории сохранена: {Path(args.stats_out).absolute()}")
+    return 0
+
+
+COMMANDS = {
+    'summary': command_summary,
+    'plot': command_plot,
+    'compare': command_compare,
+    'watch': command_watch,
+    'history': command_history
+}
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Число процессов для загрузки CSV и отрисовки (0 - по числу ядер)")
+    common.add_argument('--no-cache', action='store_true',
+                        help="Не использовать кэш разобранных CSV и отрисованных страниц")
+    common.add_argument('--stats-out', metavar='PATH',
+                        help="Сохранить таблицу статистик (.csv или .json)")
+    common.add_argument('--outlier-filter', choices=list(OUTLIER_THRESHOLDS) + ['none'], default='mad',
+                        help="Метод фильтрации выбросов внутри каждой группы")
+    common.add_argument('--outlier-threshold', type=float,
+                        help="Порог фильтра (k для mad/iqr, перцентиль для percentile)")
+    common.add_argument('--benchmark-json', metavar='PATH', action='append',
+                        help="JSON --benchmark_out со счётчиками Collisions/LoadFactor "
+                             "(по умолчанию - все такие JSON в директории данных)")
+    common.add_argument('--model', action='store_true',
+                        help="Добавить предсказания модели пробирования (hash_table_model.py)")
+    common.add_argument('--results-db', metavar='PATH', default=RESULTS_DB_DEFAULT,
+                        help="Хранилище результатов (SQLite), в которое записывается каждый новый запуск "
+                             "(по умолчанию - рядом со скриптом)")
+    common.add_argument('--no-store', action='store_true',
+                        help="Не записывать запуск в хранилище результатов")
+    common.add_argument('--run-label', help="Метка запуска в хранилище (по умолчанию - коммит git)")
+    common.add_argument('--profile', metavar='JSON',
+                        help="Записать профиль этапов (время, CPU, пик памяти tracemalloc) в JSON; "
+                             "поэтапно по файлам и страницам - при -j 1")
+
+    parser = argparse.ArgumentParser(description="Анализ производительности хэш-таблицы")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    summary = subparsers.add_parser('summary', parents=[common],
+                                    help="Текстовая статистическая сводка (без графиков)")
+    summary.add_argument('csv_directory', nargs='+', help="Директории с CSV файлами бенчмарков")
+    summary.add_argument('--streaming', action='store_true',
+                         help="Потоковый режим: квантили по скетчам без загрузки всех измерений")
+    summary.add_argument('--chunksize', type=int, default=STREAM_CHUNK_SIZE,
+                         help="Размер куска CSV в потоковом режиме")
+    summary.add_argument('--relative-error', type=float, default=0.01,
+                         help="Относительная ошибка квантилей в потоковом режиме")
+
+    plot = subparsers.add_parser('plot', parents=[common], help="PDF отчёт с графиками")
+    plot.add_argument('csv_directory', nargs='+', help="Директории с CSV файлами бенчмарков")
+    plot.add_argument('-o', '--output', metavar='PDF',
+                      help="Файл отчёта (по умолчанию hash_table_performance_analysis.pdf, "
+                           ".html для --html или hash_table_scaling.pdf для --scaling)")
+    plot.add_argument('--html', action='store_true',
+                      help="Интерактивный HTML отчёт из заранее посчитанных гистограмм вместо PDF "
+                           "(также при -o *.html)")
+    plot.add_argument('--scaling', action='store_true',
+                      help="Анализ масштабирования по N вместо распределений задержек")
+    plot.add_argument('--cliff-threshold', type=float, default=0.25,
+                      help="Падение пропускной способности между соседними N, считающееся обрывом")
+
+    compare = subparsers.add_parser('compare', parents=[common],
+                                    help="Сравнение двух запусков с поиском регрессий")
+    compare.add_argument('baseline', help="Директория базового запуска")
+    compare.add_argument('candidate', help="Директория проверяемого запуска")
+    compare.add_argument('--bootstrap', type=int, default=1000,
+                         help="Число бутстрэп-повторов")
+    compare.add_argument('--confidence', type=float, default=0.95,
+                         help="Уровень доверия интервалов")
+    compare.add_argument('--regression-threshold', type=float, default=0.05,
+                         help="Минимальное относительное замедление, считающееся регрессией")
+
+    watch = subparsers.add_parser('watch', help="Живая сводка по дописываемым файлам во время прогона")
+    watch.add_argument('csv_directory', help="Директория, в которую пишет бенчмарк")
+    watch.add_argument('--interval', type=float, default=5.0,
+                       help="Период обновления сводки в секундах")
+    watch.add_argument('--relative-error', type=float, default=0.01,
+                       help="Относительная ошибка квантилей")
+    watch.add_argument('--stats-out', metavar='PATH',
+                       help="Перезаписывать таблицу статистик при каждом обновлении (.csv или .json)")
+    watch.add_argument('--max-updates', type=int, default=0,
+                       help="Остановиться после заданного числа обновлений (0 - до Ctrl+C)")
+
+    history = subparsers.add_parser('history', help="Тренды статистик по запускам из хранилища результатов")
+    history.add_argument('--results-db', metavar='PATH', default=RESULTS_DB_DEFAULT,
+                         help="Хранилище результатов (SQLite, по умолчанию - рядом со скриптом)")
+    history.add_argument('--operation', nargs='+', help="Операции (по умолчанию все)")
+    history.add_argument('--scenario', nargs='+', help="Сценарии (по умолчанию все)")
+    history.add_argument('-n', type=int, nargs='+', help="Размеры N (по умолчанию все)")
+    history.add_argument('--method', nargs='+', choices=list(METHOD_CODES),
+                         help="Методы пробирования (по умолчанию все)")
+    history.add_argument('--metric', choices=STORE_STAT_COLUMNS[1:], default='p95_ns',
+                         help="Статистика группы")
+    history.add_argument('--last', type=int, default=50, help="Число последних запусков (0 - все)")
+    history.add_argument('--runs', action='store_true', help="Только список запусков")
+    history.add_argument('-o', '--output', metavar='PDF', help="Построить линии тренда в PDF")
+    history.add_argument('--stats-out', metavar='PATH', help="Сохранить выборку истории в CSV")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Основная функция, возвращает код завершения"""
+    args = parse_args(argv)
     try:
         print(" Анализ производительности хэш-таблицы")
         print("=" * 50)
 
         # Указываем путь к CSV файлам
-        csv_directory = r"E:\ITMO\HighCPlusPlus\PlusLabOnev3\out\build\x64-Debug"
-
-        if not os.path.exists(csv_directory):
-            print(f"❌ Директория не существует: {csv_directory}")
-            print("Пожалуйста, проверьте путь и запустите бенчмарки для создания CSV файлов")
-            return
-
-        print(f"📁 Рабочая директория: {csv_directory}")
-
-        # Загружаем данные
-        print("Загрузка данных...")
-        df = load_and_prepare_data(csv_directory)
-
-        print(f"\n Данные успешно загружены и обработаны!")
-        print(f" Всего записей после фильтрации: {len(df)}")
-        print(f" Операции: {list(df['operation'].unique())}")
-        print(f" Сценарии: {list(df['scenario'].unique())}")
-        print(f" Методы: {list(df['method_name'].unique())}")
-
-        # Создаём графики
-        output_file = "hash_table_performance_analysis.pdf"
-        print(f"\n Создание графиков...")
-        create_latency_distributions(df, output_file)
-
-        # Создаём статистическую сводку
-        create_statistical_summary(df)
-
-        result_path = Path.cwd() / output_file
-        print(f"\n Анализ завершён!")
-        print(f" Отчёт сохранён: {result_path.absolute()}")
-        print(f"\n Создано 6 ключевых графиков:")
-        print("  1.  Сравнение методов пробирования (вставка)")
-        print("  2.  Влияние распределения ключей")
-        print("  3.  Сравнение операций поиска и удаления")
-        print("  4.  Сравнение с STL (вставка)")
-        print("  5.  Bar chart средних задержек вставки")
-        print("  6.  Сравнение поиска с STL")
+        if args.command == 'compare':
+            directories = [args.baseline, args.candidate]
+        elif args.command == 'history':
+            directories = []
+        else:
+            directories = [str(directory) for directory in data_directories(args.csv_directory)]
+        for csv_directory in directories:
+            if not os.path.exists(csv_directory):
+                print(f"❌ Директория не существует: {csv_directory}")
+                print("Пожалуйста, проверьте путь и запустите бенчмарки для создания CSV файлов")
+                return 2
+
+        if directories:
+            print(f"📁 Рабочая директория: {', '.join(directories)}")
+
+        if getattr(args, 'profile', None):
+            PROFILER.start()
+        try:
+            return COMMANDS[args.command](args)
+        finally:
+            if PROFILER.enabled:
+                PROFILER.write(args.profile, command=args.command, argv=list(sys.argv[1:] if argv is None else argv))
 
     except Exception as e:
         print(f"\n Ошибка: {e}")
@@ -537,7 +3168,8 @@ def main():
         print("   • Убедитесь, что бенчмарки были запущены и создали CSV файлы")
         print("   • Проверьте путь к директории с CSV файлами")
         print("   • Убедитесь, что CSV файлы содержат колонку 'latency_ns'")
+        return 2
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
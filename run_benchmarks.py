@@ -0,0 +1,296 @@
+﻿import argparse
+import json
+import os
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Семейства бенчмарков, зарегистрированные в src/Benchmark.cpp
+BENCHMARK_FAMILIES = [
+    'BM_Collision_Test',
+    'BM_Insert_Scenarios',
+    'BM_Find',
+    'BM_Find_Existing',
+    'BM_Find_Missing',
+    'BM_Erase',
+    'BM_Upsert',
+    'BM_STL_Compare',
+    'BM_STL_Find',
+]
+
+# Имя цели CMake и типичные директории сборки (CMakeSettings.json собирает в out/build/<конфигурация>)
+BINARY_NAME = 'benchmarks'
+BUILD_DIRS = ['build', 'out/build/*', 'cmake-build-*']
+
+ISOLATED_CPUS_FILE = Path('/sys/devices/system/cpu/isolated')
+
+# taskset закрепляет процесс за ядром до exec (preexec_fn небезопасен при запуске из потоков)
+TASKSET = shutil.which('taskset')
+
+# Файлы в директории каждой конфигурации
+BENCHMARK_OUT_NAME = 'benchmark.json'
+RUN_LOG_NAME = 'run.log'
+MANIFEST_NAME = 'manifest.json'
+
+REPORT_PDF_NAME = 'hash_table_performance_analysis.pdf'
+REPORT_STATS_NAME = 'group_stats.csv'
+
+
+def find_binary(binary=None):
+    """Путь к исполняемому файлу бенчмарков: явно заданный или найденный в директориях сборки"""
+    if binary is not None:
+        path = Path(binary)
+        if not path.is_file():
+            raise FileNotFoundError(f"Исполняемый файл не найден: {path}")
+        return path.resolve()
+
+    project_dir = Path(__file__).resolve().parent
+    for pattern in BUILD_DIRS:
+        for build_dir in sorted(project_dir.glob(pattern)):
+            for name in (BINARY_NAME, BINARY_NAME + '.exe'):
+                for path in [build_dir / name, *sorted(build_dir.glob(f"*/{name}"))]:
+                    if path.is_file():
+                        return path
+    raise FileNotFoundError(f"Исполняемый файл '{BINARY_NAME}' не найден, укажите его через --binary")
+
+
+def family_filter(families):
+    """Регулярное выражение --benchmark_filter для списка семейств (BM_Find не захватывает BM_Find_Missing)"""
+    return '^(' + '|'.join(re.escape(family) for family in families) + ')(/|$)'
+
+
+def list_benchmarks(binary, benchmark_filter):
+    """Имена конфигураций, которые бинарник запустит с данным фильтром"""
+    # Бинарник создаёт файлы задержек в текущей директории, поэтому список запрашиваем во временной
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result = subprocess.run([str(binary), '--benchmark_list_tests=true', f'--benchmark_filter={benchmark_filter}'],
+                                cwd=tmp_dir, capture_output=True, text=True, check=True)
+    # Строки до списка тестов - баннер бинарника, имена бенчмарков начинаются с BM_
+    return [line.strip() for line in result.stdout.splitlines() if line.startswith('BM_')]
+
+
+def parse_cpulist(text):
+    """Разбор формата cpulist ядра Linux: '2-5,8,10-11'"""
+    cpus = []
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def available_cpus(cpulist=None):
+    """Ядра для запусков: заданные явно, изолированные (isolcpus) или доступные процессу"""
+    if not hasattr(os, 'sched_setaffinity'):
+        return None
+    if cpulist:
+        return parse_cpulist(cpulist)
+
+    if ISOLATED_CPUS_FILE.exists():
+        isolated = parse_cpulist(ISOLATED_CPUS_FILE.read_text())
+        if isolated:
+            return isolated
+
+    print("⚠️ Изолированные ядра не найдены (isolcpus), используются все доступные процессу:"
+          " соседние запуски и система могут влиять на измерения")
+    return sorted(os.sched_getaffinity(0))
+
+
+def config_directory(out_dir, name):
+    """Директория результатов конфигурации: BM_Find/1024/0 -> BM_Find_1024_0"""
+    return Path(out_dir) / re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+
+
+def run_config(binary, name, run_dir, cpu, repetitions, latency_format, extra_args):
+    """Запуск одной конфигурации в своей директории, закреплённой за ядром cpu"""
+    run_dir.mkdir(parents=True, exist_ok=True)
+    cmd = [str(binary),
+           f'--benchmark_filter=^{re.escape(name)}$',
+           f'--benchmark_repetitions={repetitions}',
+           f'--benchmark_out={BENCHMARK_OUT_NAME}',
+           '--benchmark_out_format=json',
+           f'--latency_format={latency_format}',
+           *extra_args]
+
+    if cpu is not None and TASKSET:
+        # Процесс стартует уже на ядре cpu и не мигрирует между ядрами при инициализации
+        cmd = [TASKSET, '-c', str(cpu), *cmd]
+
+    start = time.perf_counter()
+    with open(run_dir / RUN_LOG_NAME, 'w') as log:
+        process = subprocess.Popen(cmd, cwd=run_dir, stdout=log, stderr=subprocess.STDOUT)
+        if cpu is not None and not TASKSET:
+            # Без taskset закрепляем сразу после запуска
+            try:
+                os.sched_setaffinity(process.pid, {cpu})
+            except OSError as e:
+                print(f"⚠️ {name}: не удалось закрепить за ядром {cpu}: {e}")
+        returncode = process.wait()
+
+    return {
+        'name': name,
+        'dir': run_dir.name,
+        'cpu': cpu,
+        'returncode': returncode,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def run_all(binary, names, out_dir, cpus, jobs, repetitions, latency_format, extra_args, resume=False):
+    """Параллельный прогон независимых конфигураций: каждая на своём ядре, не больше одной на ядро"""
+    out_dir = Path(out_dir)
+    results = []
+    pending = []
+    for name in names:
+        run_dir = config_directory(out_dir, name)
+        out_file = run_dir / BENCHMARK_OUT_NAME
+        if resume and out_file.exists() and out_file.stat().st_size > 0:
+            results.append({'name': name, 'dir': run_dir.name, 'cpu': None, 'returncode': 0,
+                            'seconds': 0.0, 'skipped': True})
+        else:
+            pending.append((name, run_dir))
+
+    if results:
+        print(f"⏭️ Пропущено уже выполненных конфигураций: {len(results)}")
+    if not pending:
+        return results
+
+    # Очередь свободных ядер: запуск берёт ядро и возвращает его по завершении
+    free_cpus = queue.Queue()
+    for cpu in (cpus or [None] * jobs)[:jobs]:
+        free_cpus.put(cpu)
+
+    def worker(task):
+        name, run_dir = task
+        cpu = free_cpus.get()
+        try:
+            result = run_config(binary, name, run_dir, cpu, repetitions, latency_format, extra_args)
+        finally:
+            free_cpus.put(cpu)
+        status = "✅" if result['returncode'] == 0 else f"❌ код {result['returncode']}"
+        where = f"ядро {cpu}" if cpu is not None else "без закрепления"
+        print(f"   {status} {name} ({where}, {result['seconds']:.1f} с)", flush=True)
+        return result
+
+    print(f"🚀 Запуск {len(pending)} конфигураций, параллельно: {jobs}")
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results.extend(executor.map(worker, pending))
+    return results
+
+
+def write_manifest(out_dir, binary, benchmark_filter, results, wall_seconds):
+    """Манифест прогона: какая конфигурация, где и с каким результатом выполнялась"""
+    manifest = {
+        'binary': str(binary),
+        'filter': benchmark_filter,
+        'wall_seconds': round(wall_seconds, 3),
+        'runs': results,
+    }
+    path = Path(out_dir) / MANIFEST_NAME
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def run_report(command, run_dirs, out_dir, jobs):
+    """Этап отчёта: hash_table_report.py по директориям всех успешных конфигураций"""
+    import hash_table_report
+
+    report_args = [command, *map(str, run_dirs), '-j', str(jobs),
+                   '--stats-out', str(Path(out_dir) / REPORT_STATS_NAME)]
+    if command == 'plot':
+        report_args += ['-o', str(Path(out_dir) / REPORT_PDF_NAME)]
+    return hash_table_report.main(report_args)
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(
+        description="Параллельный запуск бенчмарков HashTable по ядрам и построение отчёта")
+    parser.add_argument('--binary', help=f"Исполняемый файл бенчмарков (по умолчанию ищется '{BINARY_NAME}' в build/ и out/build/)")
+    parser.add_argument('--out', default='benchmark_results', help="Директория результатов (по поддиректории на конфигурацию)")
+    parser.add_argument('--family', action='append', choices=BENCHMARK_FAMILIES,
+                        help="Семейство бенчмарков (можно несколько раз, по умолчанию все)")
+    parser.add_argument('--filter', help="Произвольное регулярное выражение --benchmark_filter вместо --family")
+    parser.add_argument('--repetitions', type=int, default=5, help="Повторений каждой конфигурации")
+    parser.add_argument('--latency-format', choices=['csv', 'bin'], default='bin',
+                        help="Формат файлов задержек (bin компактнее и быстрее читается)")
+    parser.add_argument('--cpus', help="Ядра для запусков в формате cpulist, например 2-7 (по умолчанию изолированные)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Одновременных запусков (по умолчанию число ядер; без закрепления - 1)")
+    parser.add_argument('--benchmark-arg', action='append', default=[],
+                        help="Дополнительный аргумент бинарника, например --benchmark-arg=--benchmark_min_time=0.5s")
+    parser.add_argument('--resume', action='store_true', help="Пропустить конфигурации, у которых уже есть результат")
+    parser.add_argument('--list', action='store_true', help="Только показать конфигурации и ядра")
+    parser.add_argument('--report', choices=['plot', 'summary', 'none'], default='plot',
+                        help="Этап отчёта после прогона")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Основная функция"""
+    args = parse_args(argv)
+    try:
+        binary = find_binary(args.binary)
+        benchmark_filter = args.filter or family_filter(args.family or BENCHMARK_FAMILIES)
+        names = list_benchmarks(binary, benchmark_filter)
+        if not names:
+            print(f"❌ Нет бенчмарков под фильтр {benchmark_filter}")
+            return 2
+
+        cpus = available_cpus(args.cpus)
+        if cpus is None:
+            print("⚠️ Закрепление за ядрами недоступно на этой платформе, запуски не изолированы")
+            jobs = args.jobs or 1
+        else:
+            jobs = min(args.jobs or len(cpus), len(cpus))
+        jobs = max(1, min(jobs, len(names)))
+
+        print(f"📦 Бинарник: {binary}")
+        print(f"🔎 Фильтр: {benchmark_filter} ({len(names)} конфигураций)")
+        print(f"🧮 Ядра: {cpus if cpus is not None else '-'}, параллельно: {jobs}")
+        if args.list:
+            for name in names:
+                print(f"   {name}")
+            return 0
+
+        out_dir = Path(args.out)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        results = run_all(binary, names, out_dir, cpus, jobs, args.repetitions,
+                          args.latency_format, args.benchmark_arg, args.resume)
+        wall_seconds = time.perf_counter() - start
+        manifest = write_manifest(out_dir, binary, benchmark_filter, results, wall_seconds)
+
+        failed = [result for result in results if result['returncode'] != 0]
+        cpu_seconds = sum(result['seconds'] for result in results)
+        print(f"\n⏱️ Время прогона: {wall_seconds:.1f} с (сумма по конфигурациям: {cpu_seconds:.1f} с)")
+        print(f"📝 Манифест: {manifest}")
+        for result in failed:
+            print(f"❌ {result['name']}: код {result['returncode']}, см. {out_dir / result['dir'] / RUN_LOG_NAME}")
+
+        run_dirs = [out_dir / result['dir'] for result in results if result['returncode'] == 0]
+        if args.report != 'none' and run_dirs:
+            print(f"\n📊 Отчёт ({args.report}) по {len(run_dirs)} директориям")
+            report_code = run_report(args.report, run_dirs, out_dir, jobs)
+            if report_code:
+                return report_code
+        return 1 if failed else 0
+
+    except (FileNotFoundError, subprocess.CalledProcessError) as e:
+        print(f"❌ Ошибка: {e}")
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,9 @@
 #include <benchmark/benchmark.h>
 #include <algorithm>
 #include <chrono>
+#include <cstdint>
+#include <cstdio>
+#include <cstring>
 #include <fstream>
 #include <iostream>
 #include <numeric>
@@ -49,6 +52,31 @@ std::vector<int> generate_data(int n, const std::string& scenario) {
     return data;
 }
 
+// Формат выгрузки задержек: текстовый CSV или бинарный (--latency_format=bin)
+enum class LatencyFormat {
+    CSV,
+    BINARY
+};
+
+static LatencyFormat g_latency_format = LatencyFormat::CSV;
+
+// Заголовок бинарной записи (.lat): конфигурация + число задержек,
+// за ним следует упакованный массив int64 задержек в наносекундах (little-endian)
+#pragma pack(push, 1)
+struct LatencyRecordHeader {
+    char magic[4];          // "HTLB"
+    uint32_t version;       // 1
+    char operation[16];
+    char scenario[16];
+    int32_t n;
+    int32_t method;
+    uint64_t count;
+    uint64_t reserved;
+};
+#pragma pack(pop)
+
+static_assert(sizeof(LatencyRecordHeader) == 64, "LatencyRecordHeader must be 64 bytes");
+
 // Save latency data
 void save_latency_to_csv(const std::string& filename,
     const std::vector<long long>& latencies_ns,
@@ -63,6 +91,45 @@ void save_latency_to_csv(const std::string& filename,
     out.close();
 }
 
+// Save latency data: один заголовок на конфигурацию и сырой массив int64
+void save_latency_to_bin(const std::string& filename,
+    const std::vector<long long>& latencies_ns,
+    const std::string& operation,
+    const std::string& scenario,
+    int n, int method) {
+
+    LatencyRecordHeader header{};
+    std::memcpy(header.magic, "HTLB", 4);
+    header.version = 1;
+    std::strncpy(header.operation, operation.c_str(), sizeof(header.operation) - 1);
+    std::strncpy(header.scenario, scenario.c_str(), sizeof(header.scenario) - 1);
+    header.n = n;
+    header.method = method;
+    header.count = latencies_ns.size();
+
+    static_assert(sizeof(long long) == sizeof(int64_t), "latencies are written as int64");
+
+    std::ofstream out(filename, std::ios::app | std::ios::binary);
+    out.write(reinterpret_cast<const char*>(&header), sizeof(header));
+    out.write(reinterpret_cast<const char*>(latencies_ns.data()), latencies_ns.size() * sizeof(int64_t));
+    out.close();
+}
+
+// Сохранение задержек в выбранном формате: <basename>.csv или <basename>.lat
+void save_latencies(const std::string& basename,
+    const std::vector<long long>& latencies_ns,
+    const std::string& operation,
+    const std::string& scenario,
+    int n, int method) {
+
+    if (g_latency_format == LatencyFormat::BINARY) {
+        save_latency_to_bin(basename + ".lat", latencies_ns, operation, scenario, n, method);
+    }
+    else {
+        save_latency_to_csv(basename + ".csv", latencies_ns, operation, scenario, n, method);
+    }
+}
+
 // Бенчмарк вставки с сохранением задержек
 static void BM_Insert_Scenarios(benchmark::State& state) {
     const int N = state.range(0);
@@ -101,7 +168,7 @@ static void BM_Insert_Scenarios(benchmark::State& state) {
     }
 
     // Сохраняем задержки для этой конфигурации
-    save_latency_to_csv("insert_latencies.csv", iteration_latencies, "insert", scenario, N, method_type);
+    save_latencies("insert_latencies", iteration_latencies, "insert", scenario, N, method_type);
 }
 
 // Бенчмарк поиска с сохранением задержек
@@ -136,7 +203,7 @@ static void BM_Find(benchmark::State& state) {
         iteration_latencies.push_back(duration.count() / N);
     }
 
-    save_latency_to_csv("find_latencies.csv", iteration_latencies, "find", "random", N, state.range(1));
+    save_latencies("find_latencies", iteration_latencies, "find", "random", N, state.range(1));
 }
 
 // Бенчмарк удаления с сохранением задержек
@@ -171,7 +238,7 @@ static void BM_Erase(benchmark::State& state) {
         iteration_latencies.push_back(duration.count() / N);
     }
 
-    save_latency_to_csv("erase_latencies.csv", iteration_latencies, "erase", "random", N, state.range(1));
+    save_latencies("erase_latencies", iteration_latencies, "erase", "random", N, state.range(1));
 }
 
 // Бенчмарк поиска существующих элементов
@@ -206,7 +273,7 @@ static void BM_Find_Existing(benchmark::State& state) {
         iteration_latencies.push_back(duration.count() / N);
     }
 
-    save_latency_to_csv("find_existing_latencies.csv", iteration_latencies, "find_existing", "random", N, state.range(1));
+    save_latencies("find_existing_latencies", iteration_latencies, "find_existing", "random", N, state.range(1));
 }
 
 // Бенчмарк поиска отсутствующих элементов
@@ -245,7 +312,7 @@ static void BM_Find_Missing(benchmark::State& state) {
         iteration_latencies.push_back(duration.count() / N);
     }
 
-    save_latency_to_csv("find_missing_latencies.csv", iteration_latencies, "find_missing", "random", N, state.range(1));
+    save_latencies("find_missing_latencies", iteration_latencies, "find_missing", "random", N, state.range(1));
 }
 
 // Сравнение с STL с сохранением задержек
@@ -275,7 +342,7 @@ static void BM_STL_Compare(benchmark::State& state) {
         iteration_latencies.push_back(duration.count());
     }
 
-    save_latency_to_csv("stl_latencies.csv", iteration_latencies, "stl_insert", scenario, N, -1);
+    save_latencies("stl_latencies", iteration_latencies, "stl_insert", scenario, N, -1);
 }
 
 // Сравнение поиска с STL
@@ -308,7 +375,7 @@ static void BM_STL_Find(benchmark::State& state) {
         iteration_latencies.push_back(duration.count() / N);
     }
 
-    save_latency_to_csv("stl_find_latencies.csv", iteration_latencies, "stl_find", "random", N, -1);
+    save_latencies("stl_find_latencies", iteration_latencies, "stl_find", "random", N, -1);
 }
 
 // Тест коллизий
@@ -361,7 +428,7 @@ static void BM_Upsert(benchmark::State& state) {
         state.counters["Collisions"] = table.collision_count();
     }
 
-    save_latency_to_csv("upsert_latencies.csv", iteration_latencies, "upsert", "random", N, state.range(1));
+    save_latencies("upsert_latencies", iteration_latencies, "upsert", "random", N, state.range(1));
 }
 
 // ========== РЕГИСТРАЦИЯ БЕНЧМАРКОВ ==========
@@ -422,38 +489,66 @@ BENCHMARK(BM_STL_Find)
 ->Args({ 1024, 0 })  // N=1024
 ->Unit(benchmark::kMicrosecond);
 
-// Инициализация CSV файлов
-void initialize_csv_files() {
+// Инициализация файлов задержек
+void initialize_latency_files() {
     std::vector<std::string> files = {
-        "insert_latencies.csv",
-        "find_latencies.csv",
-        "find_existing_latencies.csv",
-        "find_missing_latencies.csv",
-        "erase_latencies.csv",
-        "upsert_latencies.csv",
-        "stl_latencies.csv",
-        "stl_find_latencies.csv"
+        "insert_latencies",
+        "find_latencies",
+        "find_existing_latencies",
+        "find_missing_latencies",
+        "erase_latencies",
+        "upsert_latencies",
+        "stl_latencies",
+        "stl_find_latencies"
     };
 
+    // Файлы другого формата от прошлых запусков удаляются, иначе отчёт посчитает их повторно
     for (const auto& file : files) {
-        std::ofstream out(file);
-        out << "operation,scenario,n,method,latency_ns\n";
-        out.close();
+        if (g_latency_format == LatencyFormat::BINARY) {
+            std::remove((file + ".csv").c_str());
+            std::ofstream out(file + ".lat", std::ios::trunc | std::ios::binary);
+            out.close();
+        }
+        else {
+            std::remove((file + ".lat").c_str());
+            std::ofstream out(file + ".csv");
+            out << "operation,scenario,n,method,latency_ns\n";
+            out.close();
+        }
+    }
+}
+
+// Разбор собственного флага --latency_format=csv|bin (удаляется из argv до benchmark::Initialize)
+void parse_latency_format(int* argc, char** argv) {
+    const std::string prefix = "--latency_format=";
+    int kept = 1;
+    for (int i = 1; i < *argc; ++i) {
+        std::string arg = argv[i];
+        if (arg.rfind(prefix, 0) == 0) {
+            std::string value = arg.substr(prefix.size());
+            g_latency_format = (value == "bin" || value == "binary") ? LatencyFormat::BINARY : LatencyFormat::CSV;
+        }
+        else {
+            argv[kept++] = argv[i];
+        }
     }
+    *argc = kept;
 }
 
 int main(int argc, char** argv) {
-    initialize_csv_files();
+    parse_latency_format(&argc, argv);
+    initialize_latency_files();
 
-    std::cout << "Running hash table benchmarks with CSV export..." << std::endl;
+    const bool binary = g_latency_format == LatencyFormat::BINARY;
+    std::cout << "Running hash table benchmarks with " << (binary ? "binary" : "CSV") << " export..." << std::endl;
     std::cout << "Load factor threshold: 0.5" << std::endl;
-    std::cout << "CSV files will be created with latency data" << std::endl;
+    std::cout << (binary ? "Binary .lat files" : "CSV files") << " will be created with latency data" << std::endl;
     std::cout << "Note: Find/Erase operations measure AVERAGE time per operation" << std::endl;
 
     ::benchmark::Initialize(&argc, argv);
     ::benchmark::RunSpecifiedBenchmarks();
     ::benchmark::Shutdown();
 
-    std::cout << "Benchmarks completed! CSV files created." << std::endl;
+    std::cout << "Benchmarks completed! " << (binary ? "Binary latency" : "CSV") << " files created." << std::endl;
     return 0;
 }
\ No newline at end of file
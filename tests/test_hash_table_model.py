@@ -0,0 +1,118 @@
+﻿"""Сверка векторной модели hash_table_model с пошаговым переносом HashTable::insert/rehash/findSlot"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import hash_table_model as model
+
+
+class ReferenceHashTable:
+    """Построчный перенос src/HashTable.cpp (без удалений)"""
+
+    def __init__(self, method):
+        self.method = method
+        self.capacity = model.INITIAL_CAPACITY
+        self.table = [None] * self.capacity
+        self.size = 0
+        self.collision_count = 0
+
+    def probe(self, key, attempt):
+        key %= 2 ** 64  # static_cast<size_t>(int)
+        h1 = key % self.capacity
+        if self.method == model.METHOD_CODES['linear']:
+            return (h1 + attempt) % self.capacity
+        if self.method == model.METHOD_CODES['quadratic']:
+            return (h1 + attempt * attempt) % self.capacity
+        h2 = 1 + key % (self.capacity - 1)
+        return (h1 + attempt * h2) % self.capacity
+
+    def rehash(self):
+        old_table = self.table
+        self.capacity *= 2
+        self.table = [None] * self.capacity
+        self.size = 0
+        for key in old_table:
+            if key is not None:
+                index = self.find_slot_for_rehash(key)
+                if index < self.capacity:
+                    self.table[index] = key
+                    self.size += 1
+
+    def find_slot_for_rehash(self, key):
+        for attempt in range(self.capacity):
+            index = self.probe(key, attempt)
+            if self.table[index] is None:
+                return index
+        return self.capacity
+
+    def find_slot(self, key, count_collisions=False):
+        """Индекс ячейки и число проверенных ячеек"""
+        for attempt in range(self.capacity):
+            index = self.probe(key, attempt)
+            node = self.table[index]
+            if count_collisions and attempt > 0 and node is not None and node != key:
+                self.collision_count += 1
+            if node is None or node == key:
+                return index, attempt + 1
+        return self.capacity, self.capacity
+
+    def insert(self, key):
+        """Число проб, прирост collision_count и признак добавления ключа"""
+        if (self.size + 1) / self.capacity > model.LOAD_FACTOR_THRESHOLD:
+            self.rehash()
+
+        collisions_before = self.collision_count
+        index, probes = self.find_slot(key, count_collisions=True)
+        collisions = self.collision_count - collisions_before
+        if index >= self.capacity or self.table[index] is not None:
+            return probes, collisions, False
+
+        self.table[index] = key
+        self.size += 1
+        return probes, collisions, True
+
+
+def _case_keys(scenario, n):
+    """Ключи сценария бенчмарка; 'stride' - ключи с шагом 4096, на которых квадратичное
+    пробирование не находит свободных ячеек и вставки завершаются неудачей"""
+    if scenario == 'stride':
+        return np.arange(n, dtype=np.int64) * 4096
+    return model.generate_keys(n, scenario)
+
+
+CASES = [(scenario, n, method)
+         for scenario in model.SCENARIOS
+         for n in (1, 7, 50, 300)
+         for method in model.METHOD_CODES.values()]
+CASES += [('stride', n, method) for n in (7, 50) for method in model.METHOD_CODES.values()]
+
+
+@pytest.mark.parametrize('scenario, n, method', CASES)
+def test_simulate_insertions_matches_reference(scenario, n, method):
+    keys = _case_keys(scenario, n)
+    reference = ReferenceHashTable(method)
+    calls = [reference.insert(int(key)) for key in keys]
+
+    result = model.simulate_insertions(keys, method)
+    assert result['probes'].tolist() == [probes for probes, _, _ in calls]
+    assert result['collisions'].tolist() == [collisions for _, collisions, _ in calls]
+    assert result['inserted'].tolist() == [inserted for _, _, inserted in calls]
+    assert result['capacity'] == reference.capacity
+    assert result['size'] == reference.size
+    assert result['occupied'].tolist() == [key is not None for key in reference.table]
+
+    # Успешный поиск каждого ключа итоговой таблицы
+    expected_find = {key: reference.find_slot(key)[1] for key in reference.table if key is not None}
+    found = dict(zip(result['table_keys'].astype(np.int64).tolist(), result['find_probes'].tolist()))
+    assert found == expected_find
+
+    # Неуспешный поиск: ключи, которых нет в таблице
+    missing = [key for key in range(3 * n + 20) if key not in expected_find]
+    missing += [key * 4096 for key in range(n + 5) if key * 4096 not in expected_find]
+    expected_missing = [reference.find_slot(key)[1] for key in missing]
+    probes = model.unsuccessful_find_probes(np.array(missing), result['occupied'], method)
+    assert probes.tolist() == expected_missing
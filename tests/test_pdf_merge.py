@@ -0,0 +1,71 @@
+﻿"""Склейка одностраничных PDF matplotlib (merge_pdf_pages): порядок страниц, таблица xref и /Count"""
+import io
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+matplotlib = pytest.importorskip('matplotlib')
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import hash_table_report as report
+
+# Ширина страницы в дюймах отличает документы друг от друга: MediaBox = 72 * figsize
+PAGE_WIDTHS = [4, 5, 6]
+
+
+def _single_page_pdf(width):
+    """Одностраничный PDF matplotlib шириной width дюймов"""
+    fig, ax = plt.subplots(figsize=(width, 3))
+    ax.plot(range(10), [i * width for i in range(10)], label=f"width {width}")
+    ax.set_title(f"Страница шириной {width}")
+    ax.legend()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='pdf')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope='module')
+def merged():
+    return report.merge_pdf_pages([_single_page_pdf(width) for width in PAGE_WIDTHS])
+
+
+def test_xref_offsets_point_to_objects(merged):
+    xref_offset = int(merged[merged.rindex(b'startxref') + len(b'startxref'):].split()[0])
+    assert merged[xref_offset:].startswith(b'xref\n')
+
+    lines = merged[xref_offset:].split(b'\n')
+    first, count = map(int, lines[1].split())
+    size = int(re.search(rb'/Size (\d+)', merged[xref_offset:]).group(1))
+    assert (first, count) == (0, size)
+    for number, entry in enumerate(lines[2:2 + count]):
+        if entry.split()[2] == b'n':
+            assert merged[int(entry.split()[0]):].startswith(b'%d 0 obj\n' % number)
+
+
+def test_pages_keep_order_and_count(merged):
+    objects, root, _ = report._pdf_objects(merged)
+    pages = objects[int(re.search(rb'/Pages (\d+) 0 R', objects[root]).group(1))]
+    kids = [int(n) for n in report.PDF_REFERENCE_RE.findall(re.search(rb'/Kids \[([^\]]*)\]', pages).group(1))]
+    assert int(re.search(rb'/Count (\d+)', pages).group(1)) == len(kids) == len(PAGE_WIDTHS)
+
+    widths = []
+    for kid in kids:
+        page = objects[kid]
+        assert b'/Type /Page' in page
+        media_box = re.search(rb'/MediaBox \[\s*([\d.\s]+)\]', page).group(1).split()
+        widths.append(float(media_box[2]) / 72)
+    assert widths == PAGE_WIDTHS
+
+
+def test_page_references_resolve(merged):
+    objects, _, _ = report._pdf_objects(merged)
+    for body in objects.values():
+        dictionary = body[:body.find(b'stream\n')] if b'stream\n' in body else body
+        for number in report.PDF_REFERENCE_RE.findall(dictionary):
+            assert int(number) in objects